@@ -0,0 +1,877 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from aiohttp import web
+
+from wallet import Wallet
+from blockchain import BLOCK_ORPHAN, Blockchain
+from utility.async_peer_client import AsyncPeerClient
+from utility.events import EventBus, format_event
+from utility.hash_util import to_address
+from utility.journal import Journal
+from utility.node_options import block_response, node_argument_parser
+from utility.peer_client import PeerClient
+from utility.profiler import EXCLUDED_ROUTES, LOCAL_ADDRESSES, SAMPLING, Profiler
+from utility.signing import DEFAULT_ALGORITHM
+from utility.verification import Verification
+
+routes = web.RouteTableDef()
+
+# Profiling tag of the request being handled, passed on to the state executor
+profile_tag = contextvars.ContextVar('profile_tag', default=None)
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    if not response.prepared:
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, DELETE, OPTIONS'
+    return response
+
+
+@web.middleware
+async def profile_middleware(request, handler):
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else None
+    if route is None or route in EXCLUDED_ROUTES or request.app['profiler'].get_status() is None:
+        return await handler(request)
+
+    token = profile_tag.set('{} {}'.format(request.method, route))
+    try:
+        return await handler(request)
+    finally:
+        profile_tag.reset(token)
+        request.app['profiler'].count_request()
+
+
+async def run_in_state(app, fn, *args):
+    """
+    Run a blocking Blockchain or Wallet call on the state executor
+
+    The state executor has a single worker so the Blockchain is never mutated from two threads at once,
+    while proof of work and signature checks stay off the event loop. While profiling, the call is
+    profiled under the tag of the request it is made for.
+
+    :param app: The running application
+    :param fn: The function to call
+    :return: result of the function
+    """
+
+    return await asyncio.get_running_loop().run_in_executor(app['state_executor'],
+                                                            partial(app['profiler'].run, profile_tag.get(), fn, *args))
+
+
+async def json_or_none(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def fetch_parents_from_peers(app, orphan):
+    """
+    Ask the peer nodes for their recent blocks until the parents of an orphan block are known
+
+    The blocks are fetched on the event loop and only added on the state executor, so a slow peer does not
+    hold up other requests.
+
+    :param app: The running application
+    :param orphan: The orphan block dict
+    :return: block status of the orphan
+    """
+
+    blockchain = app['blockchain']
+    tip_hash = await run_in_state(app, blockchain.get_tip_hash)
+    height = await run_in_state(app, blockchain.get_parents_height)
+    for node in blockchain.get_peer_nodes():
+        response = await app['peer_client'].get(node, '/blocks', params={'from': height})
+        if response is None or response.status_code != 200:
+            continue
+        try:
+            blocks = response.json()
+        except ValueError:
+            continue
+        if await run_in_state(app, blockchain.add_parent_blocks, orphan, blocks):
+            break
+
+    return await run_in_state(app, blockchain.settle_orphan, orphan, tip_hash)
+
+
+async def broadcast_transaction_to_peers(app, transaction):
+    """
+    Send a transaction to all peer nodes concurrently
+
+    :param app: The running application
+    :param transaction: Dict of the transaction
+    :return: False if a peer declined the transaction, else True
+    """
+
+    blockchain = app['blockchain']
+    peer_client = app['peer_client']
+    responses = await asyncio.gather(*[
+        peer_client.post(node, '/broadcast-transaction', json=transaction) for node in blockchain.get_peer_nodes()
+    ])
+    for response in responses:
+        if response is not None and response.status_code in (400, 500):
+            print('Transaction declined, needs resolving')
+            return False
+    return True
+
+
+async def broadcast_transactions_to_peers(app, transactions):
+    """
+    Send a batch of transactions to all peer nodes concurrently
+
+    :param app: The running application
+    :param transactions: List of transaction dicts
+    """
+
+    blockchain = app['blockchain']
+    peer_client = app['peer_client']
+    responses = await asyncio.gather(*[
+        peer_client.post(node, '/broadcast-transactions', json={'transactions': transactions})
+        for node in blockchain.get_peer_nodes()
+    ])
+    for response in responses:
+        if response is not None and response.status_code in (400, 500):
+            print('Transactions declined, needs resolving')
+
+
+async def broadcast_block_to_peers(app, dict_block):
+    """
+    Send a mined block to all peer nodes concurrently
+
+    :param app: The running application
+    :param dict_block: Dict of the block
+    """
+
+    blockchain = app['blockchain']
+    peer_client = app['peer_client']
+    responses = await asyncio.gather(*[
+        peer_client.post(node, '/broadcast-block', json={'block': dict_block}) for node in blockchain.get_peer_nodes()
+    ])
+    for response in responses:
+        if response is None:
+            continue
+        if response.status_code in (400, 500):
+            print('Block declined, needs resolving')
+        if response.status_code == 409:
+            blockchain.resolve_conflicts = True
+
+
+@routes.get('/')
+async def get_node_ui(request):
+    return web.FileResponse('ui/node.html')
+
+
+@routes.get('/network')
+async def get_network_ui(request):
+    return web.FileResponse('ui/network.html')
+
+
+async def open_wallet(app):
+    """
+    Recreate the Blockchain for the current wallet keys
+
+    :param app: The running application
+    :return: response with the wallet keys and funds
+    """
+
+    wallet = app['wallet']
+    app['blockchain'] = await run_in_state(app, Blockchain, wallet.public_key, app['port'], app['sync_peer_client'],
+                                           app['state_model'], app['checkpoint_interval'], app['event_bus'],
+                                           app['prune_depth'], app['journal'])
+
+    response = {
+        'public_key': wallet.public_key,
+        'private_key': wallet.private_key,
+        'address': wallet.address,
+        'algorithm': wallet.algorithm,
+        'funds': app['blockchain'].get_balance()
+    }
+    return web.json_response(response, status=201)
+
+
+@routes.post('/wallet')
+async def create_keys(request):
+    wallet = request.app['wallet']
+    await run_in_state(request.app, wallet.create_keys)
+    if await run_in_state(request.app, wallet.save_keys):
+        return await open_wallet(request.app)
+
+    response = {
+        'message': 'Saving keys failed'
+    }
+    return web.json_response(response, status=500)
+
+
+@routes.get('/wallet')
+async def load_keys(request):
+    wallet = request.app['wallet']
+    if await run_in_state(request.app, wallet.load_keys):
+        return await open_wallet(request.app)
+
+    response = {
+        'message': 'Loading keys failed'
+    }
+    return web.json_response(response, status=500)
+
+
+@routes.get('/balance')
+async def get_balance(request):
+    balance = request.app['blockchain'].get_balance()
+
+    if balance is not None:
+        response = {
+            'message': 'Fetched balance successfully',
+            'funds': balance
+        }
+        return web.json_response(response, status=200)
+
+    response = {
+        'message': 'Loading balance failed',
+        'wallet_set_up': request.app['wallet'].public_key is not None
+    }
+    return web.json_response(response, status=500)
+
+
+@routes.post('/mine')
+async def mine(request):
+    app = request.app
+    blockchain = app['blockchain']
+    if blockchain.resolve_conflicts is True:
+        response = {
+            'message': 'Resolve conflicts first, block not added'
+        }
+        return web.json_response(response, status=409)
+
+    block = await run_in_state(app, blockchain.mine_block, False)
+
+    if block is not None:
+        dict_block = block.__dict__.copy()
+        dict_block['transactions'] = [
+            tx.__dict__ for tx in dict_block['transactions']
+        ]
+        await broadcast_block_to_peers(app, dict_block)
+        response = {
+            'message': 'Block added successfully',
+            'block': dict_block,
+            'funds': blockchain.get_balance()
+        }
+        return web.json_response(response, status=201)
+
+    response = {
+        'message': 'Adding block failed.',
+        'wallet_set_up': app['wallet'].public_key is not None
+    }
+    return web.json_response(response, status=500)
+
+
+@routes.post('/resolve-conflicts')
+async def resolve_conflicts(request):
+    app = request.app
+    blockchain = app['blockchain']
+    peer_client = app['peer_client']
+    responses = await asyncio.gather(*[
+        peer_client.get(node, '/chain') for node in blockchain.get_peer_nodes()
+    ])
+    node_chains = [response.json() for response in responses if response is not None and response.json()]
+    replaced = await run_in_state(app, blockchain.replace_chain, node_chains)
+
+    if replaced:
+        response = {
+            'message': 'Chain was replaced'
+        }
+    else:
+        response = {
+            'message': 'Local chain kept'
+        }
+
+    return web.json_response(response, status=200)
+
+
+@routes.get('/chain')
+async def get_chain(request):
+    chain_snapshot = request.app['blockchain'].chain
+    dict_chain = [
+        block.__dict__.copy() for block in chain_snapshot
+    ]
+    for dict_block in dict_chain:
+        dict_block['transactions'] = [
+            tx.__dict__ for tx in dict_block['transactions']
+        ]
+
+    return web.json_response(dict_chain, status=200,
+                             headers={'X-Pruned-Height': str(request.app['blockchain'].get_pruned_height())})
+
+
+@routes.get('/snapshot')
+async def get_snapshot(request):
+    snapshot = await run_in_state(request.app, request.app['blockchain'].get_snapshot)
+    if snapshot is None:
+        response = {
+            'message': 'No snapshot found'
+        }
+        return web.json_response(response, status=404)
+
+    return web.json_response(snapshot, status=200)
+
+
+@routes.get('/blocks')
+async def get_blocks(request):
+    try:
+        height = int(request.query.get('from', -1))
+    except ValueError:
+        height = -1
+    dict_blocks = [
+        block.__dict__.copy() for block in request.app['blockchain'].get_blocks_after(height)
+    ]
+    for dict_block in dict_blocks:
+        dict_block['transactions'] = [
+            tx.__dict__ for tx in dict_block['transactions']
+        ]
+
+    return web.json_response(dict_blocks, status=200,
+                             headers={'X-Pruned-Height': str(request.app['blockchain'].get_pruned_height())})
+
+
+@routes.get('/events')
+async def get_events(request):
+    watch = request.query.get('watch')
+    if watch is not None:
+        watch = to_address(watch)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue(maxsize=1000)
+
+    def put_event(event, data):
+        if events.full():
+            print('Event stream is too slow, dropping {} event'.format(event))
+            return
+        events.put_nowait((event, data))
+
+    def listener(event, data):
+        # Blockchain publishes from the state executor, so hand events over to the event loop
+        loop.call_soon_threadsafe(put_event, event, data)
+
+    response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    await response.prepare(request)
+    request.app['event_bus'].subscribe(listener)
+    try:
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), timeout=15)
+            except asyncio.TimeoutError:
+                await response.write(b': keep-alive\n\n')
+                continue
+
+            if event == 'balance':
+                if watch not in data['deltas']:
+                    continue
+                data = {
+                    'key': watch,
+                    'delta': data['deltas'][watch],
+                    'funds': request.app['blockchain'].get_balance(watch)
+                }
+            await response.write(format_event(event, data).encode())
+    except ConnectionResetError:
+        pass
+    finally:
+        request.app['event_bus'].unsubscribe(listener)
+
+    return response
+
+
+@routes.get('/transactions')
+async def get_open_transactions(request):
+    transactions = request.app['blockchain'].get_open_transactions()
+    dict_transactions = [
+        tx.__dict__ for tx in transactions
+    ]
+    return web.json_response(dict_transactions, status=200)
+
+
+@routes.post('/transaction')
+async def add_transaction(request):
+    app = request.app
+    wallet = app['wallet']
+    blockchain = app['blockchain']
+    if wallet.public_key is None:
+        response = {
+            'message': 'No wallet set up'
+        }
+        return web.json_response(response, status=400)
+
+    values = await json_or_none(request)
+    if not values:
+        response = {
+            'message': 'No data found'
+        }
+        return web.json_response(response, status=400)
+
+    required_fields = ['recipient', 'amount']
+    if not all(field in values for field in required_fields):
+        response = {
+            'message': 'Required data is missing'
+        }
+        return web.json_response(response, status=400)
+
+    recipient = to_address(values['recipient'])
+    amount = values['amount']
+    inputs = await run_in_state(app, blockchain.select_inputs, wallet.address, amount)
+    signature = await run_in_state(app, wallet.sign_transaction, wallet.address, recipient, amount, inputs)
+    success = await run_in_state(app, blockchain.add_transaction,
+                                 recipient, wallet.address, signature, amount, True, inputs, wallet.public_key,
+                                 wallet.algorithm)
+    transaction = {
+        'sender': wallet.address,
+        'recipient': recipient,
+        'amount': amount,
+        'signature': signature,
+        'inputs': inputs or [],
+        'public_key': wallet.public_key,
+        'algorithm': wallet.algorithm
+    }
+    if success:
+        success = await broadcast_transaction_to_peers(app, transaction)
+
+    if success:
+        response = {
+            'message': 'Successfully added transaction.',
+            'transaction': transaction,
+            'funds': blockchain.get_balance()
+        }
+        return web.json_response(response, status=201)
+
+    response = {
+        'message': 'Creating transaction failed'
+    }
+    return web.json_response(response, status=500)
+
+
+@routes.post('/broadcast-transaction')
+async def broadcast_transaction(request):
+    values = await json_or_none(request)
+    if not values:
+        response = {
+            'message': 'No data found'
+        }
+        return web.json_response(response, status=400)
+
+    required = ['sender', 'recipient', 'amount', 'signature']
+    if not all(key in values for key in required):
+        response = {
+            'message': 'Some data is missing'
+        }
+        return web.json_response(response, status=400)
+    if not Verification.verify_transaction_format(values):
+        response = {
+            'message': 'Some data is malformed'
+        }
+        return web.json_response(response, status=400)
+
+    success = await run_in_state(request.app,
+                                 request.app['blockchain'].add_transaction,
+                                 values['recipient'],
+                                 values['sender'],
+                                 values['signature'],
+                                 values['amount'],
+                                 True,
+                                 values.get('inputs'),
+                                 values.get('public_key'),
+                                 values.get('algorithm'))
+    if success:
+        response = {
+            'message': 'Successfully added transaction.',
+            'transaction': {
+                'sender': values['sender'],
+                'recipient': values['recipient'],
+                'amount': values['amount'],
+                'signature': values['signature'],
+                'inputs': values.get('inputs', []),
+                'public_key': values.get('public_key'),
+                'algorithm': values.get('algorithm')
+            }
+        }
+        return web.json_response(response, status=201)
+
+    response = {
+        'message': 'Creating transaction failed'
+    }
+    return web.json_response(response, status=500)
+
+
+@routes.post('/transactions')
+async def add_transactions(request):
+    app = request.app
+    wallet = app['wallet']
+    blockchain = app['blockchain']
+    if wallet.public_key is None:
+        response = {
+            'message': 'No wallet set up'
+        }
+        return web.json_response(response, status=400)
+
+    values = await json_or_none(request)
+    if not values or not isinstance(values.get('transactions'), list):
+        response = {
+            'message': 'No transactions found'
+        }
+        return web.json_response(response, status=400)
+
+    if not all(isinstance(tx, dict) and isinstance(tx.get('recipient'), str)
+               and Verification.valid_amount(tx.get('amount')) for tx in values['transactions']):
+        response = {
+            'message': 'Required data is missing or malformed'
+        }
+        return web.json_response(response, status=400)
+
+    def sign_all():
+        signed_transactions = []
+        selected_inputs = set()
+        for tx in values['transactions']:
+            recipient = to_address(tx['recipient'])
+            inputs = blockchain.select_inputs(wallet.address, tx['amount'], selected_inputs)
+            selected_inputs.update(inputs or [])
+            signed_transactions.append({
+                'sender': wallet.address,
+                'recipient': recipient,
+                'amount': tx['amount'],
+                'signature': wallet.sign_transaction(wallet.address, recipient, tx['amount'], inputs),
+                'inputs': inputs or [],
+                'public_key': wallet.public_key,
+                'algorithm': wallet.algorithm
+            })
+        return signed_transactions
+
+    transactions = await run_in_state(app, sign_all)
+    results = await run_in_state(app, blockchain.add_transactions, transactions, True)
+    accepted = [tx for tx, success in zip(transactions, results) if success]
+    if len(accepted) > 0:
+        await broadcast_transactions_to_peers(app, accepted)
+
+    response = {
+        'message': 'Added {} of {} transactions.'.format(len(accepted), len(results)),
+        'results': [
+            {'success': success, 'transaction': tx} for tx, success in zip(transactions, results)
+        ],
+        'funds': blockchain.get_balance()
+    }
+    return web.json_response(response, status=201 if len(accepted) > 0 else 500)
+
+
+@routes.post('/broadcast-transactions')
+async def broadcast_transactions(request):
+    values = await json_or_none(request)
+    if not values or not isinstance(values.get('transactions'), list):
+        response = {
+            'message': 'No transactions found'
+        }
+        return web.json_response(response, status=400)
+
+    required = ['sender', 'recipient', 'amount', 'signature']
+    if not all(isinstance(tx, dict) and all(key in tx for key in required) for tx in values['transactions']):
+        response = {
+            'message': 'Some data is missing'
+        }
+        return web.json_response(response, status=400)
+
+    results = await run_in_state(request.app, request.app['blockchain'].add_transactions, values['transactions'], True)
+    response = {
+        'message': 'Added {} of {} transactions.'.format(results.count(True), len(results)),
+        'results': [
+            {'success': success, 'transaction': tx} for tx, success in zip(values['transactions'], results)
+        ]
+    }
+    return web.json_response(response, status=201 if any(results) else 500)
+
+
+@routes.post('/broadcast-block')
+async def broadcast_block(request):
+    blockchain = request.app['blockchain']
+    values = await json_or_none(request)
+    if not values:
+        response = {
+            'message': 'No data found'
+        }
+        return web.json_response(response, status=400)
+    if 'block' not in values:
+        response = {
+            'message': 'Block data is missing'
+        }
+        return web.json_response(response, status=400)
+
+    status = await run_in_state(request.app, blockchain.receive_block, values['block'], False)
+    if status == BLOCK_ORPHAN:
+        status = await fetch_parents_from_peers(request.app, values['block'])
+    message, status_code = block_response(status)
+    response = {
+        'message': message
+    }
+    return web.json_response(response, status=status_code)
+
+
+@routes.get('/health')
+async def get_health(request):
+    response = {
+        'message': 'OK',
+        'pruned_height': request.app['blockchain'].get_pruned_height()
+    }
+    return web.json_response(response, status=200)
+
+
+@routes.post('/profile')
+async def start_profile(request):
+    profiler = request.app['profiler']
+    if request.remote not in LOCAL_ADDRESSES:
+        response = {
+            'message': 'Profiling can only be started from the node host'
+        }
+        return web.json_response(response, status=403)
+
+    values = await json_or_none(request) or {}
+    try:
+        started = profiler.start(values.get('mode', SAMPLING),
+                                 values.get('duration'),
+                                 values.get('requests'),
+                                 values.get('interval', 0.005))
+    except (TypeError, ValueError) as error:
+        response = {
+            'message': str(error)
+        }
+        return web.json_response(response, status=400)
+    if not started:
+        response = {
+            'message': 'Profiling is already running',
+            'profile': profiler.get_status()
+        }
+        return web.json_response(response, status=409)
+
+    response = {
+        'message': 'Profiling started',
+        'profile': profiler.get_status()
+    }
+    return web.json_response(response, status=201)
+
+
+@routes.get('/profile')
+async def get_profile(request):
+    response = {
+        'profile': request.app['profiler'].get_status(),
+        'last_result': request.app['profiler'].last_result
+    }
+    return web.json_response(response, status=200)
+
+
+@routes.delete('/profile')
+async def stop_profile(request):
+    profiler = request.app['profiler']
+    if request.remote not in LOCAL_ADDRESSES:
+        response = {
+            'message': 'Profiling can only be stopped from the node host'
+        }
+        return web.json_response(response, status=403)
+
+    # Writing the profiles can take a moment, keep it off the event loop
+    result = await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    if result is None:
+        response = {
+            'message': 'Profiling is not running',
+            'last_result': profiler.last_result
+        }
+        return web.json_response(response, status=404)
+
+    response = {
+        'message': 'Profiling stopped',
+        'result': result
+    }
+    return web.json_response(response, status=200)
+
+
+@routes.get('/nodes')
+async def get_nodes(request):
+    nodes = request.app['blockchain'].get_peer_nodes()
+    response = {
+        'all_nodes': nodes,
+        'peers': request.app['peer_client'].get_peer_states(nodes)
+    }
+    return web.json_response(response, status=200)
+
+
+@routes.post('/node')
+async def add_node(request):
+    blockchain = request.app['blockchain']
+    values = await json_or_none(request)
+    if not values:
+        response = {
+            'message': 'No data attached'
+        }
+        return web.json_response(response, status=400)
+
+    if 'node' not in values:
+        response = {
+            'message': 'No node data found'
+        }
+        return web.json_response(response, status=400)
+
+    await run_in_state(request.app, blockchain.add_peer_node, values['node'])
+    response = {
+        'message': 'Node added successfully',
+        'all_nodes': blockchain.get_peer_nodes()
+    }
+    return web.json_response(response, status=201)
+
+
+@routes.delete('/node/{node_url}')
+async def remove_node(request):
+    blockchain = request.app['blockchain']
+    node_url = request.match_info.get('node_url')
+    if node_url == '' or node_url is None:
+        response = {
+            'message': 'No node found'
+        }
+        return web.json_response(response, status=400)
+
+    await run_in_state(request.app, blockchain.remove_peer_node, node_url)
+    request.app['peer_client'].remove_peer(node_url)
+    response = {
+        'message': 'Node removed successfully',
+        'all_nodes': blockchain.get_peer_nodes()
+    }
+    return web.json_response(response, status=200)
+
+
+async def backfill_history(app, node):
+    """
+    Fetch the chain history before the bootstrap snapshot in the background
+
+    :param app: The running application
+    :param node: The peer node URL
+    """
+
+    response = await app['peer_client'].get(node, '/chain')
+    history = response.json() if response is not None and response.status_code == 200 else None
+    if history is None or not await run_in_state(app, app['blockchain'].add_history, history):
+        print('Backfilling history from {} failed'.format(node))
+
+
+async def bootstrap_from_peer(app):
+    """
+    Start from the snapshot of the bootstrap peer when the local chain is empty
+    """
+
+    node = app['bootstrap']
+    blockchain = app['blockchain']
+    if node is None or len(blockchain.chain) > 1:
+        return
+
+    await run_in_state(app, blockchain.add_peer_node, node)
+    peer_client = app['peer_client']
+    snapshot_response = await peer_client.get(node, '/snapshot')
+    if snapshot_response is not None and snapshot_response.status_code == 200 and snapshot_response.json():
+        snapshot = snapshot_response.json()
+        blocks_response = await peer_client.get(node, '/blocks', params={'from': snapshot.get('height', 0)})
+        if blocks_response is not None and blocks_response.status_code == 200 and \
+                await run_in_state(app, blockchain.load_snapshot, snapshot, blocks_response.json(), app['checkpoint_hash']):
+            if app['prune_depth'] is None:
+                app['backfill'] = asyncio.ensure_future(backfill_history(app, node))
+            return
+
+    print('Bootstrapping from {} failed, starting from genesis'.format(node))
+
+
+async def close_peer_client(app):
+    await app['peer_client'].close()
+    app['state_executor'].shutdown(wait=False)
+    app['journal'].close()
+    app['profiler'].stop()
+
+
+def create_app(port, connect_timeout=2.0, read_timeout=10.0, failure_threshold=3, backoff_max=60.0,
+               state_model='account', checkpoint_interval=100, bootstrap=None, checkpoint_hash=None,
+               prune_depth=None, signature_algorithm=DEFAULT_ALGORITHM, journal_interval=0.05, journal_batch=100,
+               profile=None, profile_duration=None, profile_requests=None, profile_interval=0.005,
+               profile_dir='profiles'):
+    """
+    Create the async node application
+
+    :param port: The port the node listens on, also used as node id
+    :param connect_timeout: Seconds to wait for a connection to a peer
+    :param read_timeout: Seconds to wait for a peer response
+    :param failure_threshold: Consecutive failures before a peer is skipped
+    :param backoff_max: Upper limit of the time a peer is skipped for
+    :param state_model: 'account' or 'utxo', see Blockchain
+    :param checkpoint_interval: Number of blocks between state snapshots
+    :param bootstrap: Peer node to fetch a snapshot from when starting with an empty chain
+    :param checkpoint_hash: Trusted hash the bootstrap snapshot must match
+    :param prune_depth: Number of recent blocks to keep transactions for, None to keep all
+    :param signature_algorithm: Signature algorithm of newly created wallets
+    :param journal_interval: Seconds accepted transactions may wait before they are written to disk
+    :param journal_batch: Number of accepted transactions written without waiting for the interval
+    :param profile: Profiling mode to start with, None to only profile on request
+    :param profile_duration: Seconds to profile for
+    :param profile_requests: Number of requests to profile
+    :param profile_interval: Seconds between samples in sampling mode
+    :param profile_dir: Directory profiles are written to
+    :return: web.Application
+    """
+
+    app = web.Application(middlewares=[cors_middleware, profile_middleware])
+    app.add_routes(routes)
+    app['port'] = port
+    app['state_model'] = state_model
+    app['checkpoint_interval'] = checkpoint_interval
+    app['bootstrap'] = bootstrap
+    app['checkpoint_hash'] = checkpoint_hash
+    app['prune_depth'] = prune_depth
+    app['state_executor'] = ThreadPoolExecutor(max_workers=1)
+    app['peer_client'] = AsyncPeerClient(connect_timeout=connect_timeout,
+                                         read_timeout=read_timeout,
+                                         failure_threshold=failure_threshold,
+                                         backoff_max=backoff_max)
+    app['sync_peer_client'] = PeerClient(connect_timeout=connect_timeout,
+                                         read_timeout=read_timeout,
+                                         failure_threshold=failure_threshold,
+                                         backoff_max=backoff_max)
+    app['wallet'] = Wallet(port, signature_algorithm)
+    app['event_bus'] = EventBus()
+    app['profiler'] = Profiler(port, profile_dir)
+    if profile is not None:
+        app['profiler'].start(profile, profile_duration, profile_requests, profile_interval)
+    app['journal'] = Journal('mempool-{}.journal'.format(port), journal_interval, journal_batch)
+    app['blockchain'] = Blockchain(app['wallet'].public_key, port, app['sync_peer_client'], state_model,
+                                   checkpoint_interval, app['event_bus'], prune_depth, app['journal'])
+    app.on_startup.append(bootstrap_from_peer)
+    app.on_cleanup.append(close_peer_client)
+    return app
+
+
+if __name__ == '__main__':
+    args = node_argument_parser().parse_args()
+
+    web.run_app(create_app(args.port,
+                           connect_timeout=args.connect_timeout,
+                           read_timeout=args.read_timeout,
+                           failure_threshold=args.failure_threshold,
+                           backoff_max=args.backoff_max,
+                           state_model=args.state_model,
+                           checkpoint_interval=args.checkpoint_interval,
+                           bootstrap=args.bootstrap,
+                           checkpoint_hash=args.checkpoint_hash,
+                           prune_depth=args.prune_depth,
+                           signature_algorithm=args.signature_algorithm,
+                           journal_interval=args.journal_interval,
+                           journal_batch=args.journal_batch,
+                           profile=args.profile,
+                           profile_duration=args.profile_duration,
+                           profile_requests=args.profile_requests,
+                           profile_interval=args.profile_interval,
+                           profile_dir=args.profile_dir),
+                host='0.0.0.0', port=args.port)
@@ -4,7 +4,7 @@ from utility.printable import Printable
 
 
 class Block(Printable):
-    def __init__(self, index, previous_hash, transactions, proof, timestamp=None):
+    def __init__(self, index, previous_hash, transactions, proof, timestamp=None, pruned_hash=None):
         """
         Create a block for the blockchain
 
@@ -13,6 +13,7 @@ class Block(Printable):
         :param transactions: List of transactions
         :param proof: Proof of block solution
         :param timestamp: Time of block creation
+        :param pruned_hash: Hash of the block if its transactions were pruned, else None
         """
 
         self.index = index
@@ -20,3 +21,4 @@ class Block(Printable):
         self.timestamp = time() if timestamp is None else timestamp
         self.transactions = transactions
         self.proof = proof
+        self.pruned_hash = pruned_hash
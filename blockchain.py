@@ -1,36 +1,84 @@
 # Initialising blockchain list
 import json
-import requests
-
-from functools import reduce
 
 from block import Block
 from transaction import Transaction
+from utxo_set import UtxoSet
+from utility.events import EventBus
 from utility.verification import Verification
-from utility.hash_util import hash_block
+from utility.hash_util import hash_block, hash_snapshot, merkle_root, to_address
+from utility.journal import Journal
+from utility.peer_client import PeerClient
 from wallet import Wallet
 
 MINING_REWARD = 10
+UNDO_DEPTH = 100
+CHECKPOINT_INTERVAL = 100
+MAX_ORPHANS = 100
+MAX_SIDE_BLOCKS = 100
+
+BLOCK_ADDED = 'added'
+BLOCK_REORGANIZED = 'reorganized'
+BLOCK_STORED = 'stored'
+BLOCK_ORPHAN = 'orphan'
+BLOCK_KNOWN = 'known'
+BLOCK_STALE = 'stale'
+BLOCK_INVALID = 'invalid'
 
 
 class Blockchain:
-    def __init__(self, public_key, node_id):
+    def __init__(self, public_key, node_id, peer_client=None, state_model='account',
+                 checkpoint_interval=CHECKPOINT_INTERVAL, event_bus=None, prune_depth=None, journal=None):
         """
         Create a blockchain with open transactions and a genesis block, then loads data
 
         :param public_key: The public_key of the hosting node
         :param node_id: the id of the node initiating the Blockchain
+        :param peer_client: The PeerClient used to contact peer nodes
+        :param state_model: 'account' to validate spends against balances, 'utxo' to validate them
+                            against the set of unspent outputs
+        :param checkpoint_interval: Number of blocks between state snapshots
+        :param event_bus: The EventBus block, transaction and balance changes are published to
+        :param prune_depth: Number of recent blocks to keep transactions for, at least 1, None to keep all
+        :param journal: The Journal accepted open transactions are written to between full saves
         """
 
+        if prune_depth is not None and prune_depth < 1:
+            raise ValueError('Prune depth must be at least 1')
+
         genesis_block = Block(0, '', [], 100, 0)
+        self.__balances = {}
+        self.__pending_spends = {}
+        self.__pending_inputs = set()
+        self.__utxo_set = UtxoSet() if state_model == 'utxo' else None
+        self.__undo = {}
+        self.__side_blocks = {}
+        self.__orphans = {}
+        self.__base_state = {'index': 0, 'balances': {}, 'utxo': {}}
         self.chain = [genesis_block]
         self.__open_transactions = []
         self.public_key = public_key
         self.node_id = node_id
+        self.checkpoint_interval = checkpoint_interval
+        self.prune_depth = prune_depth
+        self.__checkpoint_height = None
         self.__peer_nodes = set()
-        self.resolve_conflicts = False
+        self.__peer_client = PeerClient() if peer_client is None else peer_client
+        self.__event_bus = EventBus() if event_bus is None else event_bus
+        self.__resolve_conflicts = False
+        self.__journal = Journal('mempool-{}.journal'.format(node_id)) if journal is None else journal
         self.load_data()
 
+    @property
+    def resolve_conflicts(self):
+        return self.__resolve_conflicts
+
+    @resolve_conflicts.setter
+    def resolve_conflicts(self, val):
+        if val != self.__resolve_conflicts:
+            self.__event_bus.publish('resolve_conflicts', {'resolve_conflicts': val})
+        self.__resolve_conflicts = val
+
     @property
     def chain(self):
         return self.__chain[:]
@@ -38,6 +86,262 @@ class Blockchain:
     @chain.setter
     def chain(self, val):
         self.__chain = val
+        self.__balances = dict(self.__base_state['balances'])
+        for block in val:
+            if block.index > self.__base_state['index']:
+                self.__apply_block_balances(block)
+
+    def __watch_balances(self, transactions):
+        """
+        Record the balances of all participants of some transactions before they change
+
+        :param transactions: The transactions about to be added or removed
+        :return: dict of participant to balance, empty if nobody listens for events
+        """
+
+        if not self.__event_bus.has_listeners():
+            return {}
+
+        participants = {to_address(tx.sender) for tx in transactions} | \
+                       {to_address(tx.recipient) for tx in transactions}
+        participants.discard('MINING')
+        return {participant: self.get_balance(participant) for participant in participants}
+
+    def __publish_changes(self, balances, blocks=(), added=(), removed=()):
+        """
+        Publish added blocks, open transaction changes and balance deltas
+
+        :param balances: Balances recorded by __watch_balances before the change
+        :param blocks: Blocks added to the chain
+        :param added: Transactions added to the open transactions
+        :param removed: Transactions removed from the open transactions
+        """
+
+        if not self.__event_bus.has_listeners():
+            return
+
+        for block in blocks:
+            dict_block = block.__dict__.copy()
+            dict_block['transactions'] = [tx.__dict__ for tx in dict_block['transactions']]
+            self.__event_bus.publish('block', dict_block)
+        if len(blocks) > 0:
+            tip = self.__chain[-1]
+            self.__event_bus.publish('tip', {'index': tip.index, 'hash': hash_block(tip)})
+        for tx in added:
+            self.__event_bus.publish('transaction_added', tx.__dict__)
+        for tx in removed:
+            self.__event_bus.publish('transaction_removed', tx.__dict__)
+
+        deltas = {}
+        for participant, balance in balances.items():
+            delta = self.get_balance(participant) - balance
+            if delta != 0:
+                deltas[participant] = delta
+        if len(deltas) > 0:
+            self.__event_bus.publish('balance', {'deltas': deltas})
+
+    def __apply_block_balances(self, block, balances=None, undo=False):
+        """
+        Add the transactions of a block to the balance index
+
+        :param block: The block to apply
+        :param balances: The balances to update, defaults to the balance index
+        :param undo: Boolean to take the transactions out again instead
+        """
+
+        balances = self.__balances if balances is None else balances
+        sign = -1 if undo else 1
+        for tx in block.transactions:
+            sender = to_address(tx.sender)
+            recipient = to_address(tx.recipient)
+            balances[sender] = balances.get(sender, 0) - sign * tx.amount
+            balances[recipient] = balances.get(recipient, 0) + sign * tx.amount
+
+    def __prune(self):
+        """
+        Drop the transactions of blocks deeper than the prune depth, moving the base state past them
+
+        Pruning runs once prune_depth further blocks can be pruned, so the base state is rebuilt rarely.
+        """
+
+        if self.prune_depth is None:
+            return
+
+        prune_height = self.__chain[-1].index - self.prune_depth
+        if prune_height - self.__base_state['index'] < self.prune_depth:
+            return
+
+        balances = dict(self.__base_state['balances'])
+        utxo_set = UtxoSet(self.__base_state['utxo']) if self.__utxo_set is not None else None
+        start = self.__chain[0].index
+        for block in self.__chain[self.__base_state['index'] + 1 - start:prune_height + 1 - start]:
+            self.__apply_block_balances(block, balances)
+            if utxo_set is not None:
+                utxo_set.apply_block(block)
+            self.__chain[block.index - start] = Block(block.index,
+                                                      block.previous_hash,
+                                                      [],
+                                                      block.proof,
+                                                      block.timestamp,
+                                                      hash_block(block))
+
+        self.__base_state = {
+            'index': prune_height,
+            'balances': balances,
+            'utxo': utxo_set.to_dict() if utxo_set is not None else {}
+        }
+
+    def get_pruned_height(self):
+        """
+        Get the highest block index whose transactions this node cannot serve
+
+        :return: block index, 0 if the node has the full history
+        """
+
+        return self.__base_state['index']
+
+    def __update_pending_spends(self):
+        """
+        Rebuild the amounts and outputs spent by open transactions
+        """
+
+        self.__pending_spends = {}
+        self.__pending_inputs = set()
+        for tx in self.__open_transactions:
+            sender = to_address(tx.sender)
+            self.__pending_spends[sender] = self.__pending_spends.get(sender, 0) + tx.amount
+            self.__pending_inputs.update(tx.inputs)
+
+    def __add_open_transaction(self, transaction):
+        self.__open_transactions.append(transaction)
+        sender = to_address(transaction.sender)
+        self.__pending_spends[sender] = self.__pending_spends.get(sender, 0) + transaction.amount
+        self.__pending_inputs.update(transaction.inputs)
+
+    def __clear_open_transactions(self):
+        self.__open_transactions = []
+        self.__pending_spends = {}
+        self.__pending_inputs = set()
+
+    def __apply_utxo_block(self, block):
+        """
+        Apply a block to the UTXO set and keep its undo data
+
+        :param block: The block to apply
+        :return: Boolean, False if the block spends unknown or already spent outputs
+        """
+
+        if self.__utxo_set is None:
+            return True
+
+        undo = self.__utxo_set.apply_block(block)
+        if undo is None:
+            return False
+
+        self.__undo[block.index] = undo
+        self.__undo.pop(block.index - UNDO_DEPTH, None)
+        return True
+
+    def __rebuild_utxo_set(self, chain):
+        """
+        Build a new UTXO set by applying every block of a chain
+
+        :param chain: The chain to apply
+        :return: Boolean, False if the chain spends unknown or already spent outputs
+        """
+
+        utxo_set = UtxoSet(self.__base_state['utxo'])
+        undo = {}
+        for block in chain:
+            if block.index <= self.__base_state['index']:
+                continue
+            block_undo = utxo_set.apply_block(block)
+            if block_undo is None:
+                return False
+            if block.index > chain[-1].index - UNDO_DEPTH:
+                undo[block.index] = block_undo
+
+        self.__utxo_set = utxo_set
+        self.__undo = undo
+        return True
+
+    def __switch_utxo_chain(self, chain, fork_index=None):
+        """
+        Move the UTXO set to another chain by undoing the local blocks after the fork point
+        and applying the new ones, falling back to a full rebuild without undo data
+
+        :param chain: The chain to switch to
+        :param fork_index: First block index at which the chains differ, if already known
+        :return: Boolean, False if the new chain spends unknown or already spent outputs
+        """
+
+        if self.__utxo_set is None:
+            return True
+
+        if fork_index is None:
+            fork_index = self.fork_index(chain)
+        local_blocks = [block for block in self.__chain if block.index >= fork_index]
+        new_blocks = [block for block in chain if block.index >= fork_index]
+
+        if fork_index <= self.__base_state['index'] \
+                or not all(block.index in self.__undo for block in local_blocks):
+            return self.__rebuild_utxo_set(chain)
+
+        for block in reversed(local_blocks):
+            self.__utxo_set.undo_block(block, self.__undo.pop(block.index))
+
+        applied = []
+        for block in new_blocks:
+            if not self.__apply_utxo_block(block):
+                for applied_block in reversed(applied):
+                    self.__utxo_set.undo_block(applied_block, self.__undo.pop(applied_block.index))
+                for local_block in local_blocks:
+                    self.__apply_utxo_block(local_block)
+                return False
+            applied.append(block)
+
+        return True
+
+    def fork_index(self, chain):
+        """
+        Find the first block index at which a chain differs from the local chain
+
+        :param chain: The chain to compare, it may start at a later index than genesis
+        :return: block index
+        """
+
+        local_start = self.__chain[0].index
+        start = chain[0].index
+        index = max(local_start, start)
+        end = min(self.__chain[-1].index, chain[-1].index)
+        while index <= end:
+            if index < end:
+                same = self.__chain[index + 1 - local_start].previous_hash == chain[index + 1 - start].previous_hash
+            else:
+                same = hash_block(self.__chain[index - local_start]) == hash_block(chain[index - start])
+            if not same:
+                return index
+            index += 1
+
+        return index
+
+    def __save_utxo_set(self):
+        if self.__utxo_set is not None:
+            self.__utxo_set.save('utxo-{}.txt'.format(self.node_id), hash_block(self.__chain[-1]), self.__undo)
+
+    def __load_utxo_set(self):
+        """
+        Load the UTXO snapshot, rebuilding it from the chain if it does not match the chain tip
+        """
+
+        if self.__utxo_set is None:
+            return
+
+        snapshot = UtxoSet.load('utxo-{}.txt'.format(self.node_id))
+        if snapshot is not None and snapshot[1] == hash_block(self.__chain[-1]):
+            self.__utxo_set, _, self.__undo = snapshot
+        elif not self.__rebuild_utxo_set(self.__chain):
+            print('Stored chain spends invalid outputs')
 
     def get_chain(self):
         return self.chain[:]
@@ -55,44 +359,97 @@ class Blockchain:
                 # file_content = pickle.loads(file.read())
                 file_content = file.readlines()
 
+                if len(file_content) > 3:
+                    self.__base_state = json.loads(file_content[3])
+
                 blockchain = json.loads(file_content[0][:-1])
                 updated_blockchain = []
                 for block in blockchain:
-                    converted_tx = [
-                        Transaction(tx['sender'],
-                                    tx['recipient'],
-                                    tx['signature'],
-                                    tx['amount']) for tx in block['transactions']
-                    ]
+                    converted_tx = [Transaction.from_dict(tx) for tx in block['transactions']]
 
                     updated_block = Block(block['index'],
                                           block['previous_hash'],
                                           converted_tx, block['proof'],
-                                          block['timestamp'])
+                                          block['timestamp'],
+                                          block.get('pruned_hash'))
 
                     updated_blockchain.append(updated_block)
-                self.__chain = updated_blockchain
 
                 open_transactions = json.loads(file_content[1][:-1])
                 updated_transactions = []
                 for tx in open_transactions:
-                    updated_transaction = Transaction(tx['sender'],
-                                                      tx['recipient'],
-                                                      tx['signature'],
-                                                      tx['amount'])
+                    updated_transaction = Transaction.from_dict(tx)
                     updated_transactions.append(updated_transaction)
+
+                # Blocks saved before the Merkle root hashing do not link up and their proofs cannot be migrated
+                if any(block.previous_hash != hash_block(updated_blockchain[index])
+                       for (index, block) in enumerate(updated_blockchain[1:])):
+                    print('Warning: blockchain-{}.txt was saved in an older block format, starting a new chain '
+                          'without its blocks and open transactions'.format(self.node_id))
+                    self.__base_state = {'index': 0, 'balances': {}, 'utxo': {}}
+                    updated_blockchain = self.__chain[:1]
+                    updated_transactions = []
+                valid = Verification.verify_signatures(updated_transactions)
+                if not all(valid):
+                    print('Warning: dropping {} saved open transactions signed in an older format'.format(
+                        valid.count(False)))
+                    updated_transactions = [tx for (tx, is_valid) in zip(updated_transactions, valid) if is_valid]
+
+                self.chain = updated_blockchain
                 self.__open_transactions = updated_transactions
+                self.__update_pending_spends()
 
                 peer_nodes = json.loads(file_content[2])
                 self.__peer_nodes = set(peer_nodes)
         except (IOError, IndexError):
             pass
         finally:
+            self.__load_utxo_set()
+            self.__replay_journal()
             print('Cleanup!')
 
+    def __journal_transactions(self, transactions):
+        """
+        Queue accepted open transactions for the journal instead of saving everything
+
+        :param transactions: The accepted transactions
+        """
+
+        tip_hash = hash_block(self.__chain[-1])
+        self.__journal.append([{'tip': tip_hash, 'transaction': tx.__dict__} for tx in transactions])
+
+    def __replay_journal(self):
+        """
+        Add the open transactions journaled since the last full save
+
+        Entries journaled on another chain tip are skipped, a block may already hold them. If the saved
+        open transactions already contain the entries, the last full save stopped before it emptied the
+        journal and nothing is added.
+        """
+
+        self.__journal.flush()
+        tip_hash = hash_block(self.__chain[-1])
+        journaled = []
+        for entry in self.__journal.read():
+            if entry.get('tip') != tip_hash:
+                continue
+            tx = entry['transaction']
+            journaled.append(Transaction.from_dict(tx))
+        if len(journaled) < 1:
+            return
+
+        saved_ids = [(tx.tx_id(), tx.signature) for tx in self.__open_transactions]
+        journaled_ids = [(tx.tx_id(), tx.signature) for tx in journaled]
+        for start in range(len(saved_ids) - len(journaled_ids) + 1):
+            if saved_ids[start:start + len(journaled_ids)] == journaled_ids:
+                return
+
+        for transaction in journaled:
+            self.__add_open_transaction(transaction)
+
     def save_data(self):
         """
-        Saves current blockchain and open transactions
+        Saves current blockchain and open transactions, then empties the journal they include
         """
 
         try:
@@ -103,7 +460,8 @@ class Blockchain:
                               block_el.previous_hash,
                               [tx.__dict__ for tx in block_el.transactions],
                               block_el.proof,
-                              block_el.timestamp) for block_el in self.__chain
+                              block_el.timestamp,
+                              block_el.pruned_hash) for block_el in self.__chain
                     ]
                 ]
                 file.write(json.dumps(chain))
@@ -114,9 +472,221 @@ class Blockchain:
                 file.write(json.dumps(transactions))
                 file.write('\n')
                 file.write(json.dumps(list(self.__peer_nodes)))
+                if self.__base_state['index'] > 0:
+                    file.write('\n')
+                    file.write(json.dumps(self.__base_state))
+            self.__journal.reset()
         except IOError:
             print('Saving Failed')
 
+    def __checkpoint(self):
+        """
+        Write a snapshot of the derived state once the chain passes a checkpoint height
+
+        Peers bootstrap from the snapshot and the blocks after it, so a snapshot is also written once
+        pruning moved past it, as the blocks after it could no longer be served in full.
+        """
+
+        tip = self.__chain[-1]
+        if self.__checkpoint_height is None:
+            snapshot = self.get_snapshot()
+            self.__checkpoint_height = snapshot['height'] if snapshot is not None else 0
+        if tip.index // self.checkpoint_interval <= self.__checkpoint_height // self.checkpoint_interval \
+                and self.get_pruned_height() <= self.__checkpoint_height:
+            return
+
+        dict_tip = tip.__dict__.copy()
+        dict_tip['transactions'] = [tx.__dict__ for tx in dict_tip['transactions']]
+        snapshot = {
+            'height': tip.index,
+            'tip': dict_tip,
+            'balances': self.__balances,
+            'utxo': self.__utxo_set.to_dict() if self.__utxo_set is not None else None,
+            'open_transactions': [tx.__dict__ for tx in self.__open_transactions]
+        }
+        snapshot['hash'] = hash_snapshot(snapshot)
+        try:
+            with open('snapshot-{}.txt'.format(self.node_id), mode='w') as file:
+                file.write(json.dumps(snapshot))
+            self.__checkpoint_height = tip.index
+        except IOError:
+            print('Saving snapshot failed')
+
+    def get_snapshot(self):
+        """
+        Get the latest state snapshot of this node
+
+        :return: snapshot dict|None if no checkpoint was reached yet
+        """
+
+        try:
+            with open('snapshot-{}.txt'.format(self.node_id), mode='r') as file:
+                return json.loads(file.read())
+        except (IOError, ValueError):
+            return None
+
+    def get_blocks_after(self, height):
+        """
+        Get the local blocks above a height
+
+        :param height: The block index to start after
+        :return: block list
+        """
+
+        return [block for block in self.__chain if block.index > height]
+
+    @staticmethod
+    def __convert_block(block):
+        return Block(block['index'],
+                     block['previous_hash'],
+                     [Transaction.from_dict(tx) for tx in block['transactions']],
+                     block['proof'],
+                     block['timestamp'],
+                     block.get('pruned_hash'))
+
+    def bootstrap(self, node, checkpoint_hash=None):
+        """
+        Fetch the latest snapshot of a peer and the blocks after it, then start from them
+
+        :param node: The peer node URL
+        :param checkpoint_hash: Trusted snapshot hash, if the operator pinned one
+        :return: Boolean
+        """
+
+        response = self.__peer_client.get(node, '/snapshot')
+        if response is None or response.status_code != 200:
+            return False
+        try:
+            snapshot = response.json()
+            response = self.__peer_client.get(node, '/blocks', params={'from': snapshot['height']})
+            if response is None or response.status_code != 200:
+                return False
+            blocks = response.json()
+        except (ValueError, KeyError, TypeError):
+            print('Snapshot from {} could not be read'.format(node))
+            return False
+
+        return self.load_snapshot(snapshot, blocks, checkpoint_hash)
+
+    def load_snapshot(self, snapshot, blocks, checkpoint_hash=None):
+        """
+        Replace the local chain with a snapshot tip and the blocks after it, verifying only those blocks
+
+        The snapshot hash only detects corruption, no block commits to it. Unless the operator pinned a
+        checkpoint hash, the balances of the snapshot are taken on trust.
+
+        :param snapshot: Snapshot dict as written at a checkpoint
+        :param blocks: List of block dicts following the snapshot tip
+        :param checkpoint_hash: Trusted snapshot hash, if the operator pinned one
+        :return: Boolean
+        """
+
+        try:
+            if hash_snapshot(snapshot) != snapshot['hash']:
+                print('Snapshot does not match its hash')
+                return False
+            if checkpoint_hash is not None and snapshot['hash'] != checkpoint_hash:
+                print('Snapshot does not match the trusted checkpoint')
+                return False
+            if checkpoint_hash is None:
+                print('Warning: snapshot is not pinned with a checkpoint hash, trusting the balances of the peer')
+            if self.__utxo_set is not None and snapshot['utxo'] is None:
+                print('Snapshot has no UTXO set')
+                return False
+            chain = [self.__convert_block(snapshot['tip'])] + [self.__convert_block(block) for block in blocks]
+            open_transactions = [Transaction.from_dict(tx) for tx in snapshot['open_transactions']]
+        except (KeyError, TypeError):
+            print('Snapshot could not be read')
+            return False
+
+        if any(block.pruned_hash is not None for block in chain[1:]):
+            print('Blocks after the snapshot are pruned')
+            return False
+        if not Verification.verify_chain(chain):
+            return False
+
+        # Open transactions of the snapshot may have been mined since, in the blocks following it
+        mined = {tx.tx_id() for block in chain for tx in block.transactions}
+        open_transactions = [tx for tx in open_transactions if tx.tx_id() not in mined]
+
+        previous_base_state = self.__base_state
+        self.__base_state = {
+            'index': chain[0].index,
+            'balances': snapshot['balances'],
+            'utxo': snapshot['utxo'] or {}
+        }
+        if self.__utxo_set is not None and not self.__rebuild_utxo_set(chain):
+            self.__base_state = previous_base_state
+            return False
+
+        self.chain = chain
+        self.__open_transactions = open_transactions
+        if self.__utxo_set is not None:
+            self.__drop_conflicting_transactions()
+        self.__update_pending_spends()
+        self.__prune()
+        self.save_data()
+        self.__save_utxo_set()
+        return True
+
+    def fetch_history(self, node):
+        """
+        Fetch the full chain of a peer to fill in the history before the first local block
+
+        :param node: The peer node URL
+        :return: list of block dicts|None
+        """
+
+        response = self.__peer_client.get(node, '/chain')
+        if response is None or response.status_code != 200:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def add_history(self, chain):
+        """
+        Prepend the blocks before the first local block, if they link up to it and lead to the base state
+
+        :param chain: List of block dicts starting at genesis
+        :return: Boolean
+        """
+
+        first_block = self.__chain[0]
+        if first_block.index == 0:
+            return True
+
+        base_index = self.__base_state['index']
+        try:
+            history = [self.__convert_block(block) for block in chain if block['index'] <= base_index]
+        except (KeyError, TypeError):
+            return False
+        if len(history) != base_index + 1 \
+                or any(block.pruned_hash is not None for block in history) \
+                or hash_block(history[0]) != hash_block(Block(0, '', [], 100, 0)) \
+                or any(hash_block(history[block.index]) != hash_block(block)
+                       for block in self.__chain if block.index <= base_index) \
+                or not Verification.verify_chain(history):
+            return False
+
+        # The base state came with the snapshot, the history has to add up to it
+        balances = {}
+        utxo_set = UtxoSet()
+        for block in history:
+            self.__apply_block_balances(block, balances)
+            if self.__utxo_set is not None and utxo_set.apply_block(block) is None:
+                return False
+        if {owner: amount for owner, amount in balances.items() if amount != 0} \
+                != {owner: amount for owner, amount in self.__base_state['balances'].items() if amount != 0} \
+                or (self.__utxo_set is not None and utxo_set.to_dict() != self.__base_state['utxo']):
+            print('History does not match the snapshot balances')
+            return False
+
+        self.__chain = history[:first_block.index] + self.__chain
+        self.save_data()
+        return True
+
     def proof_of_work(self):
         """
         Determine proof of work
@@ -126,9 +696,10 @@ class Blockchain:
 
         last_block = self.__chain[-1]
         last_hash = hash_block(last_block)
+        root = merkle_root(self.__open_transactions)
         proof = 0
 
-        while not Verification.valid_proof(self.__open_transactions, last_hash, proof):
+        while not Verification.valid_proof(self.__open_transactions, last_hash, proof, root):
             proof += 1
         return proof
 
@@ -136,6 +707,7 @@ class Blockchain:
         """
         Get balance for specific blockchain participant
 
+        :param sender: The participant's address or public key, defaults to the hosting node
         :return: balance amount
         """
 
@@ -143,28 +715,26 @@ class Blockchain:
             if self.public_key is None:
                 return None
 
-            participant = self.public_key
+            participant = to_address(self.public_key)
         else:
-            participant = sender
+            participant = to_address(sender)
 
-        sender_tx = [
-            [tx.amount for tx in block.transactions if tx.sender == participant] for block in self.__chain
-        ]
-        sender_open_tx = [
-            tx.amount for tx in self.__open_transactions if tx.sender == participant
-        ]
-        sender_tx.append(sender_open_tx)
-        amount_sent = reduce(
-            lambda tx_sum, tx_amt: tx_sum + sum(tx_amt) if len(tx_amt) > 0 else tx_sum + 0, sender_tx, 0
-        )
-        recipient_tx = [
-            [tx.amount for tx in block.transactions if tx.recipient == participant] for block in self.__chain
-        ]
-        amount_received = reduce(
-            lambda tx_sum, tx_amt: tx_sum + sum(tx_amt) if len(tx_amt) > 0 else tx_sum + 0, recipient_tx, 0
-        )
+        return self.__balances.get(participant, 0) - self.__pending_spends.get(participant, 0)
+
+    def select_inputs(self, owner, amount, exclude=()):
+        """
+        Pick unspent outputs of an owner to fund a new transaction (UTXO state model only)
 
-        return amount_received - amount_sent
+        :param owner: The owner's address or public key
+        :param amount: The amount to cover
+        :param exclude: Further outpoints which must not be picked
+        :return: list of outpoints|None if the funds are insufficient or the account model is used
+        """
+
+        if self.__utxo_set is None:
+            return None
+
+        return self.__utxo_set.select(to_address(owner), amount, self.__pending_inputs | set(exclude))
 
     def get_last_blockchain_value(self):
         """
@@ -178,7 +748,14 @@ class Blockchain:
 
         return self.__chain[-1]
 
-    def add_transaction(self, recipient: str, sender, signature, amount=1.0, is_receiving=False):
+    def __verify_new_transaction(self, transaction, spent_inputs):
+        if self.__utxo_set is not None:
+            return Verification.verify_utxo_transaction(transaction, self.__utxo_set, spent_inputs)
+
+        return Verification.verify_transaction(transaction, self.get_balance)
+
+    def add_transaction(self, recipient: str, sender, signature, amount=1.0, is_receiving=False, inputs=None,
+                        public_key=None, algorithm=None):
         """
         Append a new value as well as the last blockchain value
 
@@ -187,40 +764,119 @@ class Blockchain:
         :param signature: The signature of the transaction
         :param amount: The amount of coins sent (default = 1.0)
         :param is_receiving: Boolean to determine if node is receiving data from peer node
+        :param inputs: Outpoints spent by the transaction (UTXO state model only)
+        :param public_key: Public key of the sender, if the sender is given as an address
+        :param algorithm: The signature algorithm, None for RSA
         :return: boolean
         """
 
-        transaction = Transaction(sender, recipient, signature, amount)
+        transaction = Transaction(sender, recipient, signature, amount, inputs, public_key, algorithm)
 
-        if Verification.verify_transaction(transaction, self.get_balance):
-            self.__open_transactions.append(transaction)
-            self.save_data()
+        if self.__verify_new_transaction(transaction, self.__pending_inputs):
+            balances = self.__watch_balances([transaction])
+            self.__add_open_transaction(transaction)
+            self.__journal_transactions([transaction])
+            self.__publish_changes(balances, added=[transaction])
 
             if not is_receiving:
                 for node in self.__peer_nodes:
-                    url = 'http://{}/broadcast-transaction'.format(node)
-                    try:
-                        response = requests.post(url, json={
-                            'sender': sender,
-                            'recipient': recipient,
-                            'amount': amount,
-                            'signature': signature
-                        })
-                        if response.status_code == 400 or response.status_code == 500:
-                            print('Transaction declined, needs resolving')
-                            return False
-                        return True
-                    except requests.exceptions.ConnectionError:
+                    response = self.__peer_client.post(node, '/broadcast-transaction', json={
+                        'sender': sender,
+                        'recipient': recipient,
+                        'amount': amount,
+                        'signature': signature,
+                        'inputs': transaction.inputs,
+                        'public_key': public_key,
+                        'algorithm': algorithm
+                    })
+                    if response is None:
                         continue
+                    if response.status_code == 400 or response.status_code == 500:
+                        print('Transaction declined, needs resolving')
+                        return False
+                    return True
 
             return True
 
         return False
 
-    def mine_block(self):
+    def add_transactions(self, transactions, is_receiving=False):
+        """
+        Verify a batch of transactions and append the valid ones, then save and broadcast once
+
+        Malformed transactions are rejected first, then signatures are checked in parallel and funds are
+        checked in order so earlier transactions of the batch count against the balance of later ones.
+
+        :param transactions: List of dicts with sender, recipient, signature, amount and optionally
+                             inputs, public_key and algorithm
+        :param is_receiving: Boolean to determine if node is receiving data from peer node
+        :return: list of booleans, one per transaction
+        """
+
+        converted_transactions = [Transaction.from_dict(tx) if Verification.verify_transaction_format(tx) else None
+                                  for tx in transactions]
+        valid_signatures = iter(Verification.verify_signatures([tx for tx in converted_transactions
+                                                                if tx is not None]))
+        batch_spends = {}
+        spent_inputs = set(self.__pending_inputs)
+        results = []
+        accepted = []
+        for transaction in converted_transactions:
+            if transaction is None or not next(valid_signatures):
+                results.append(False)
+                continue
+
+            sender = to_address(transaction.sender)
+            spent = batch_spends.get(sender, 0)
+            if self.__utxo_set is not None:
+                has_funds = self.__utxo_set.validate_transaction(transaction, spent_inputs)
+            else:
+                has_funds = self.get_balance(transaction.sender) - spent >= transaction.amount
+            if not has_funds:
+                results.append(False)
+                continue
+
+            batch_spends[sender] = spent + transaction.amount
+            spent_inputs.update(transaction.inputs)
+            accepted.append(transaction)
+            results.append(True)
+
+        if len(accepted) < 1:
+            return results
+
+        balances = self.__watch_balances(accepted)
+        for transaction in accepted:
+            self.__add_open_transaction(transaction)
+        self.__journal_transactions(accepted)
+        self.__publish_changes(balances, added=accepted)
+
+        if not is_receiving:
+            self.broadcast_transactions(accepted)
+
+        return results
+
+    def broadcast_transactions(self, transactions):
+        """
+        Send a batch of transactions to all peer nodes in one request each
+
+        :param transactions: The transactions to send
+        """
+
+        dict_transactions = [tx.__dict__ for tx in transactions]
+        for node in self.__peer_nodes:
+            response = self.__peer_client.post(node, '/broadcast-transactions', json={
+                'transactions': dict_transactions
+            })
+            if response is None:
+                continue
+            if response.status_code == 400 or response.status_code == 500:
+                print('Transactions declined, needs resolving')
+
+    def mine_block(self, broadcast=True):
         """
         Mine new block and add to existing blockchain with open trans.
 
+        :param broadcast: Boolean to determine if the block is sent to peer nodes
         :return: block|None
         """
 
@@ -231,7 +887,7 @@ class Blockchain:
         hashed_block = hash_block(last_block)
         proof = self.proof_of_work()
 
-        reward_transaction = Transaction('MINING', self.public_key, '', MINING_REWARD)
+        reward_transaction = Transaction('MINING', to_address(self.public_key), '', MINING_REWARD)
 
         copied_transactions = self.__open_transactions[:]
         for tx in copied_transactions:
@@ -239,30 +895,47 @@ class Blockchain:
                 return None
 
         copied_transactions.append(reward_transaction)
-        block = Block(len(self.__chain),
+        block = Block(last_block.index + 1,
                       hashed_block,
                       copied_transactions,
                       proof)
+        if not self.__apply_utxo_block(block):
+            return None
 
+        balances = self.__watch_balances(block.transactions)
+        removed_transactions = self.__open_transactions
         self.__chain.append(block)
-        self.__open_transactions = []
+        self.__apply_block_balances(block)
+        self.__clear_open_transactions()
+        self.__prune()
         self.save_data()
+        self.__save_utxo_set()
+        self.__checkpoint()
+        self.__publish_changes(balances, blocks=[block], removed=removed_transactions)
+
+        if broadcast:
+            self.broadcast_block(block)
+        return block
+
+    def broadcast_block(self, block):
+        """
+        Send a mined block to all peer nodes
+
+        :param block: The block to send
+        """
 
+        converted_block = block.__dict__.copy()
+        converted_block['transactions'] = [
+            tx.__dict__ for tx in converted_block['transactions']
+        ]
         for node in self.__peer_nodes:
-            url = 'http://{}/broadcast-block'.format(node)
-            converted_block = block.__dict__.copy()
-            converted_block['transactions'] = [
-                tx.__dict__ for tx in converted_block['transactions']
-            ]
-            try:
-                response = requests.post(url, json={'block': converted_block})
-                if response.status_code == 400 or response.status_code == 500:
-                    print('Block declined, needs resolving')
-                if response.status_code == 409:
-                    self.resolve_conflicts = True
-            except requests.exceptions.ConnectionError:
+            response = self.__peer_client.post(node, '/broadcast-block', json={'block': converted_block})
+            if response is None:
                 continue
-        return block
+            if response.status_code == 400 or response.status_code == 500:
+                print('Block declined, needs resolving')
+            if response.status_code == 409:
+                self.resolve_conflicts = True
 
     def add_block(self, block):
         """
@@ -271,12 +944,7 @@ class Blockchain:
         :param block: The block to add
         :return: Boolean
         """
-        transactions = [
-            Transaction(tx['sender'],
-                        tx['recipient'],
-                        tx['signature'],
-                        tx['amount']) for tx in block['transactions']
-        ]
+        transactions = [Transaction.from_dict(tx) for tx in block['transactions']]
         proof_is_valid = Verification.valid_proof(transactions[:-1], block['previous_hash'], block['proof'])
         hashes_match = hash_block(self.chain[-1]) == block['previous_hash']
         if not proof_is_valid or not hashes_match:
@@ -287,57 +955,434 @@ class Blockchain:
                                 transactions,
                                 block['proof'],
                                 block['timestamp'])
-        self.__chain.append(converted_block)
-        stored_transactions = self.__open_transactions[:]
-        for itx in block['transactions']:
-            for open_tx in stored_transactions:
-                if (open_tx.sender == itx['sender']
-                        and open_tx.recipient == itx['recipient']
-                        and open_tx.amount == itx['amount']
-                        and open_tx.signature == itx['signature']):
-                    try:
-                        self.__open_transactions.remove(open_tx)
-                    except ValueError:
-                        print('Item was already removed')
+        if not Verification.verify_block_signatures(converted_block):
+            return False
+        return self.__append_block(converted_block)
+
+    def __append_block(self, block):
+        """
+        Append a verified block to the chain tip and remove its transactions from the open transactions
+
+        :param block: The block to append
+        :return: Boolean, False if the block spends unknown or already spent outputs
+        """
+
+        if not self.__apply_utxo_block(block):
+            return False
+
+        previous_open_transactions = self.__open_transactions[:]
+        balances = self.__watch_balances(block.transactions + previous_open_transactions)
+        self.__chain.append(block)
+        self.__apply_block_balances(block)
+        block_tx_ids = {tx.tx_id() for tx in block.transactions}
+        self.__open_transactions = [tx for tx in self.__open_transactions if tx.tx_id() not in block_tx_ids]
+        if self.__utxo_set is not None:
+            self.__drop_conflicting_transactions()
+        self.__update_pending_spends()
+        self.__prune()
+
+        self.save_data()
+        self.__save_utxo_set()
+        self.__checkpoint()
+        self.__publish_changes(balances,
+                               blocks=[block],
+                               removed=[tx for tx in previous_open_transactions
+                                        if tx not in self.__open_transactions])
+        return True
+
+    def receive_block(self, block, fetch_parents=True):
+        """
+        Add a block sent by a peer to the block tree
+
+        Blocks extending the tip are appended, blocks on other branches are kept by hash and the chain
+        switches to a branch once it holds more work than the local blocks after the fork. Blocks whose
+        parent is unknown are kept until the parent arrives.
+
+        :param block: The block dict
+        :param fetch_parents: Boolean to ask the peers for the blocks missing before an orphan
+        :return: BLOCK_ADDED, BLOCK_REORGANIZED, BLOCK_STORED, BLOCK_ORPHAN, BLOCK_KNOWN, BLOCK_STALE or BLOCK_INVALID
+        """
+
+        try:
+            converted_block = self.__convert_block(block)
+        except (KeyError, TypeError):
+            return BLOCK_INVALID
+        if converted_block.pruned_hash is not None:
+            return BLOCK_INVALID
+        if converted_block.index <= max(self.__base_state['index'], self.__chain[-1].index - UNDO_DEPTH):
+            return BLOCK_STALE
+
+        block_hash = hash_block(converted_block)
+        if block_hash in self.__side_blocks or block_hash in self.__orphans \
+                or self.__main_block_hash(converted_block.index) == block_hash:
+            return BLOCK_KNOWN
+        if not Verification.valid_proof(converted_block.transactions[:-1],
+                                        converted_block.previous_hash,
+                                        converted_block.proof):
+            return BLOCK_INVALID
+        if not Verification.verify_block_signatures(converted_block):
+            return BLOCK_INVALID
+
+        status = self.__attach_block(converted_block, block_hash)
+        self.__trim_block_tree()
+        if status == BLOCK_ORPHAN and fetch_parents:
+            tip_hash = self.get_tip_hash()
+            self.__fetch_parents(block)
+            status = self.settle_orphan(block, tip_hash)
+        return status
+
+    def get_tip_hash(self):
+        return hash_block(self.__chain[-1])
+
+    def get_parents_height(self):
+        """
+        Get the height to request blocks from when the parents of an orphan are missing
+
+        Only blocks within the undo depth are requested, deeper forks are left to resolve.
+
+        :return: block index
+        """
+
+        return max(self.__base_state['index'], self.__chain[-1].index - UNDO_DEPTH)
+
+    def add_parent_blocks(self, orphan, blocks):
+        """
+        Add the blocks a peer sent for the missing parents of an orphan
+
+        :param orphan: The orphan block dict
+        :param blocks: The block dicts sent by the peer
+        :return: Boolean, True if the orphan is no longer missing parents
+        """
+
+        if isinstance(blocks, list):
+            for block in blocks:
+                self.receive_block(block, fetch_parents=False)
+
+        return hash_block(self.__convert_block(orphan)) not in self.__orphans
+
+    def settle_orphan(self, orphan, tip_hash):
+        """
+        Get the status of a block received as orphan once the peers were asked for its parents
+
+        If the parents are still missing and the block is ahead of the chain, the fork is older than the
+        blocks the peers were asked for and resolve_conflicts is set to fetch whole chains instead.
+
+        :param orphan: The orphan block dict
+        :param tip_hash: Hash of the chain tip when the orphan was received
+        :return: BLOCK_ADDED, BLOCK_REORGANIZED, BLOCK_STORED or BLOCK_ORPHAN
+        """
+
+        converted_block = self.__convert_block(orphan)
+        block_hash = hash_block(converted_block)
+        if block_hash in self.__orphans:
+            if converted_block.index > self.__chain[-1].index:
+                self.resolve_conflicts = True
+            return BLOCK_ORPHAN
+        if self.__main_block_hash(converted_block.index) != block_hash:
+            return BLOCK_STORED
+        if tip_hash in self.__side_blocks:
+            return BLOCK_REORGANIZED
+
+        return BLOCK_ADDED
+
+    def __main_block_hash(self, index):
+        """
+        Get the hash of the main chain block at an index
+
+        :param index: The block index
+        :return: hash string|None if the chain has no block at that index
+        """
+
+        start = self.__chain[0].index
+        tip = self.__chain[-1]
+        if index < start or index > tip.index:
+            return None
+        if index == tip.index:
+            return hash_block(tip)
+
+        return self.__chain[index + 1 - start].previous_hash
+
+    def __attach_block(self, block, block_hash):
+        """
+        Put a block with a valid proof into the block tree, then attach the orphans waiting for it
+
+        :param block: The block
+        :param block_hash: The hash of the block
+        :return: block status
+        """
+
+        parent = self.__side_blocks.get(block.previous_hash)
+        if block.previous_hash == self.__main_block_hash(self.__chain[-1].index) \
+                and block.index == self.__chain[-1].index + 1:
+            if not self.__append_block(block):
+                return BLOCK_INVALID
+            status = BLOCK_ADDED
+        elif (parent is not None and parent.index == block.index - 1) \
+                or block.previous_hash == self.__main_block_hash(block.index - 1):
+            if block.index <= self.get_parents_height():
+                return BLOCK_STALE
+            if self.__reuses_proof(block):
+                return BLOCK_KNOWN
+            self.__side_blocks[block_hash] = block
+            if len(self.__side_blocks) > MAX_SIDE_BLOCKS:
+                lowest = min(self.__side_blocks, key=lambda side_hash: self.__side_blocks[side_hash].index)
+                del self.__side_blocks[lowest]
+                if block_hash not in self.__side_blocks:
+                    return BLOCK_STALE
+            status = BLOCK_REORGANIZED if self.__choose_branch(block_hash) else BLOCK_STORED
+        else:
+            self.__orphans[block_hash] = block
+            if len(self.__orphans) > MAX_ORPHANS:
+                del self.__orphans[next(iter(self.__orphans))]
+            return BLOCK_ORPHAN
+
+        for orphan_hash, orphan in list(self.__orphans.items()):
+            if orphan.previous_hash == block_hash and orphan_hash in self.__orphans:
+                del self.__orphans[orphan_hash]
+                if self.__attach_block(orphan, orphan_hash) == BLOCK_REORGANIZED:
+                    status = BLOCK_REORGANIZED
+        return status
+
+    def __reuses_proof(self, block):
+        """
+        Check if a known block with the same parent already holds the proof and transactions of a block
+
+        The proof does not cover the timestamp, so a block only differing in its timestamp is the same work.
+
+        :param block: The block
+        :return: Boolean
+        """
+
+        tx_ids = [tx.tx_id() for tx in block.transactions]
+        start = self.__chain[0].index
+        siblings = list(self.__side_blocks.values())
+        if start <= block.index <= self.__chain[-1].index:
+            siblings.append(self.__chain[block.index - start])
+        return any(sibling.previous_hash == block.previous_hash
+                   and sibling.proof == block.proof
+                   and [tx.tx_id() for tx in sibling.transactions] == tx_ids
+                   for sibling in siblings)
+
+    def __choose_branch(self, tip_hash):
+        """
+        Switch to the side branch ending at a block if it holds more work than the main chain after the fork
+
+        :param tip_hash: Hash of the last block of the side branch
+        :return: Boolean, True if the chain switched
+        """
+
+        branch = []
+        block = self.__side_blocks.get(tip_hash)
+        while block is not None:
+            branch.append(block)
+            block = self.__side_blocks.get(block.previous_hash)
+        branch.reverse()
+
+        fork_index = branch[0].index
+        if fork_index <= self.__base_state['index'] \
+                or self.__main_block_hash(fork_index - 1) != branch[0].previous_hash:
+            return False
+
+        main_blocks = self.get_blocks_after(fork_index - 1)
+        if any(block.pruned_hash is not None for block in main_blocks):
+            return False
+        branch_work = sum(Verification.block_work(block) for block in branch)
+        if branch_work <= sum(Verification.block_work(block) for block in main_blocks):
+            return False
+
+        return self.__switch_branch(branch, main_blocks)
+
+    def __switch_branch(self, branch, main_blocks):
+        """
+        Undo the main chain blocks after the fork and apply the blocks of a side branch instead
+
+        The transactions of the undone blocks go back to the open transactions if they are still covered.
+
+        :param branch: The side branch blocks, starting right after the fork
+        :param main_blocks: The main chain blocks after the fork
+        :return: Boolean, False if the branch spends unknown or already spent outputs
+        """
+
+        fork_index = branch[0].index
+        chain = self.__chain[:fork_index - self.__chain[0].index] + branch
+        if not self.__switch_utxo_chain(chain, fork_index):
+            for block in branch:
+                self.__side_blocks.pop(hash_block(block), None)
+            return False
+
+        previous_open_transactions = self.__open_transactions
+        balances = self.__watch_balances(
+            [tx for block in branch + main_blocks for tx in block.transactions] + previous_open_transactions
+        )
+        for block in reversed(main_blocks):
+            self.__apply_block_balances(block, undo=True)
+            self.__side_blocks[hash_block(block)] = block
+        for block in branch:
+            self.__apply_block_balances(block)
+            self.__side_blocks.pop(hash_block(block), None)
+        self.__chain = chain
+        # The switch settled the fork a conflicting peer response may have flagged
+        self.resolve_conflicts = False
+
+        branch_tx_ids = {tx.tx_id() for block in branch for tx in block.transactions}
+        candidates = [tx for block in main_blocks for tx in block.transactions if tx.sender != 'MINING']
+        self.__clear_open_transactions()
+        for tx in candidates + previous_open_transactions:
+            if tx.tx_id() in branch_tx_ids:
+                continue
+            if self.__utxo_set is not None:
+                if not self.__utxo_set.validate_transaction(tx, self.__pending_inputs):
+                    continue
+            elif self.get_balance(tx.sender) < tx.amount:
+                continue
+            self.__add_open_transaction(tx)
+        self.__prune()
 
         self.save_data()
+        self.__save_utxo_set()
+        self.__checkpoint()
+        self.__publish_changes(balances,
+                               blocks=branch,
+                               added=[tx for tx in self.__open_transactions if tx not in previous_open_transactions],
+                               removed=[tx for tx in previous_open_transactions
+                                        if tx not in self.__open_transactions])
         return True
 
+    def __fetch_parents(self, orphan):
+        """
+        Ask the peers for their recent blocks until the parents of an orphan are known
+
+        :param orphan: The orphan block dict
+        """
+
+        height = self.get_parents_height()
+        for node in list(self.__peer_nodes):
+            response = self.__peer_client.get(node, '/blocks', params={'from': height})
+            if response is None or response.status_code != 200:
+                continue
+            try:
+                blocks = response.json()
+            except ValueError:
+                continue
+            if self.add_parent_blocks(orphan, blocks):
+                return
+
+    def __trim_block_tree(self):
+        """
+        Forget side branch and orphan blocks too deep to switch to
+        """
+
+        min_index = self.__chain[-1].index - UNDO_DEPTH
+        for blocks in (self.__side_blocks, self.__orphans):
+            for block_hash in [block_hash for block_hash, block in blocks.items() if block.index <= min_index]:
+                del blocks[block_hash]
+
+    def __drop_conflicting_transactions(self):
+        """
+        Remove open transactions whose inputs were spent by a block
+        """
+
+        spent = set()
+        valid_transactions = []
+        for tx in self.__open_transactions:
+            if self.__utxo_set.validate_transaction(tx, spent):
+                spent.update(tx.inputs)
+                valid_transactions.append(tx)
+        self.__open_transactions = valid_transactions
+
     def resolve(self):
+        """
+        Fetch the chains of all peer nodes and replace the local chain with the longest valid one
+
+        :return: Boolean
+        """
+
+        node_chains = []
+        for node in self.__peer_nodes:
+            response = self.__peer_client.get(node, '/chain')
+            if response is None:
+                continue
+            try:
+                node_chains.append(response.json())
+            except ValueError:
+                print('Chain from {} could not be read'.format(node))
+
+        return self.replace_chain(node_chains)
+
+    def replace_chain(self, node_chains):
+        """
+        Replace the local chain with the longest valid chain supplied
+
+        :param node_chains: List of chains fetched from peer nodes
+        :return: Boolean
+        """
+
         winner_chain = self.chain
         replace = False
 
-        for node in self.__peer_nodes:
-            url = 'http://{}/chain'.format(node)
+        for node_chain in node_chains:
             try:
-                response = requests.get(url)
-                node_chain = response.json()
-                node_chain = [
-                    Block(block['index'],
-                          block['previous_hash'],
-                          [Transaction(tx['sender'],
-                                       tx['recipient'],
-                                       tx['signature'],
-                                       tx['amount']
-                                       ) for tx in block['transactions']],
-                          block['proof'],
-                          block['timestamp']
-                          ) for block in node_chain]
-                node_chain_length = len(node_chain)
-                local_chain_length = len(winner_chain)
-                if node_chain_length > local_chain_length and Verification.verify_chain(node_chain):
-                    winner_chain = node_chain
-                    replace = True
-            except requests.exceptions.ConnectionError:
+                node_chain = [self.__convert_block(block) for block in node_chain]
+            except (KeyError, TypeError):
+                print('Chain could not be read')
+                continue
+            if len(node_chain) < 1 or node_chain[-1].index <= winner_chain[-1].index:
                 continue
+            if node_chain[0].index > 0 and self.fork_index(node_chain) <= node_chain[0].index:
+                print('Chain starts at a snapshot that differs from the local chain')
+                continue
+            pruned_blocks = [block for block in node_chain if block.pruned_hash is not None]
+            if len(pruned_blocks) > 0 and self.fork_index(node_chain) <= pruned_blocks[-1].index:
+                print('Chain forks in history the peer has pruned')
+                continue
+            if Verification.verify_chain(node_chain):
+                winner_chain = node_chain
+                replace = True
+
+        previous_base_state = self.__base_state
+        if replace:
+            fork_index = self.fork_index(winner_chain)
+            if fork_index > self.__base_state['index']:
+                # Keep the local copies of the shared blocks, the peer may lack their history
+                winner_chain = [block for block in self.__chain if block.index < fork_index] + \
+                               [block for block in winner_chain if block.index >= fork_index]
+            elif winner_chain[0].index == 0 and all(block.pruned_hash is None for block in winner_chain):
+                self.__base_state = {'index': 0, 'balances': {}, 'utxo': {}}
+            else:
+                print('Chain forks before the local snapshot, local chain kept')
+                winner_chain = self.chain
+                replace = False
+
+        if replace and not self.__switch_utxo_chain(winner_chain):
+            print('Chain spends invalid outputs, local chain kept')
+            self.__base_state = previous_base_state
+            winner_chain = self.chain
+            replace = False
+
+        new_blocks = []
+        balances = {}
+        removed_transactions = []
+        if replace:
+            fork_index = self.fork_index(winner_chain)
+            new_blocks = [block for block in winner_chain if block.index >= fork_index]
+            changed_blocks = new_blocks + [block for block in self.__chain if block.index >= fork_index]
+            removed_transactions = self.__open_transactions
+            balances = self.__watch_balances(
+                [tx for block in changed_blocks for tx in block.transactions] + removed_transactions
+            )
 
         self.resolve_conflicts = False
         self.chain = winner_chain
 
         if replace:
-            self.__open_transactions = []
+            self.__clear_open_transactions()
+            self.__prune()
 
         self.save_data()
+        self.__save_utxo_set()
+        if replace:
+            self.__checkpoint()
+            self.__publish_changes(balances, blocks=new_blocks, removed=removed_transactions)
         return replace
 
     def add_peer_node(self, node):
@@ -356,6 +1401,7 @@ class Blockchain:
         :param node: The node URL to remove
         """
         self.__peer_nodes.discard(node)
+        self.__peer_client.remove_peer(node)
         self.save_data()
 
     def get_peer_nodes(self):
@@ -365,3 +1411,11 @@ class Blockchain:
         :return: node list
         """
         return list(self.__peer_nodes)
+
+    def get_peer_states(self):
+        """
+        Get the health state of all connected peer nodes
+
+        :return: list of peer state dicts
+        """
+        return self.__peer_client.get_peer_states(self.__peer_nodes)
@@ -1,13 +1,38 @@
-from flask import Flask, jsonify, request, send_from_directory
+import atexit
+import queue
+import threading
+
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 from flask_cors import CORS
 
 from wallet import Wallet
 from blockchain import Blockchain
+from utility.events import EventBus, format_event
+from utility.hash_util import to_address
+from utility.journal import Journal
+from utility.node_options import block_response, node_argument_parser
+from utility.peer_client import PeerClient
+from utility.profiler import EXCLUDED_ROUTES, LOCAL_ADDRESSES, SAMPLING, Profiler
+from utility.verification import Verification
 
 app = Flask(__name__)
 CORS(app)
 
 
+@app.before_request
+def begin_profile():
+    if request.url_rule is not None and request.url_rule.rule not in EXCLUDED_ROUTES:
+        g.profile_token = profiler.begin('{} {}'.format(request.method, request.url_rule.rule))
+
+
+@app.teardown_request
+def end_profile(exception):
+    token = g.pop('profile_token', None)
+    if token is not None:
+        profiler.end(token)
+        profiler.count_request()
+
+
 @app.route('/', methods=['GET'])
 def get_node_ui():
     return send_from_directory('ui', 'node.html')
@@ -23,11 +48,14 @@ def create_keys():
     wallet.create_keys()
     if wallet.save_keys():
         global blockchain
-        blockchain = Blockchain(wallet.public_key, port)
+        blockchain = Blockchain(wallet.public_key, port, peer_client, state_model, checkpoint_interval, event_bus,
+                            prune_depth, journal)
 
         response = {
             'public_key': wallet.public_key,
             'private_key': wallet.private_key,
+            'address': wallet.address,
+            'algorithm': wallet.algorithm,
             'funds': blockchain.get_balance()
         }
 
@@ -44,11 +72,14 @@ def create_keys():
 def load_keys():
     if wallet.load_keys():
         global blockchain
-        blockchain = Blockchain(wallet.public_key, port)
+        blockchain = Blockchain(wallet.public_key, port, peer_client, state_model, checkpoint_interval, event_bus,
+                            prune_depth, journal)
 
         response = {
             'public_key': wallet.public_key,
             'private_key': wallet.private_key,
+            'address': wallet.address,
+            'algorithm': wallet.algorithm,
             'funds': blockchain.get_balance()
         }
 
@@ -136,7 +167,71 @@ def get_chain():
             tx.__dict__ for tx in dict_block['transactions']
         ]
 
-    return jsonify(dict_chain), 200
+    return jsonify(dict_chain), 200, {'X-Pruned-Height': blockchain.get_pruned_height()}
+
+
+@app.route('/snapshot', methods=['GET'])
+def get_snapshot():
+    snapshot = blockchain.get_snapshot()
+    if snapshot is None:
+        response = {
+            'message': 'No snapshot found'
+        }
+        return jsonify(response), 404
+
+    return jsonify(snapshot), 200
+
+
+@app.route('/blocks', methods=['GET'])
+def get_blocks():
+    height = request.args.get('from', -1, type=int)
+    dict_blocks = [
+        block.__dict__.copy() for block in blockchain.get_blocks_after(height)
+    ]
+    for dict_block in dict_blocks:
+        dict_block['transactions'] = [
+            tx.__dict__ for tx in dict_block['transactions']
+        ]
+
+    return jsonify(dict_blocks), 200, {'X-Pruned-Height': blockchain.get_pruned_height()}
+
+
+@app.route('/events', methods=['GET'])
+def get_events():
+    watch = request.args.get('watch')
+    if watch is not None:
+        watch = to_address(watch)
+    events = queue.Queue(maxsize=1000)
+
+    def listener(event, data):
+        try:
+            events.put_nowait((event, data))
+        except queue.Full:
+            print('Event stream is too slow, dropping {} event'.format(event))
+
+    def stream():
+        event_bus.subscribe(listener)
+        try:
+            while True:
+                try:
+                    event, data = events.get(timeout=15)
+                except queue.Empty:
+                    yield ': keep-alive\n\n'
+                    continue
+
+                if event == 'balance':
+                    if watch not in data['deltas']:
+                        continue
+                    data = {
+                        'key': watch,
+                        'delta': data['deltas'][watch],
+                        'funds': blockchain.get_balance(watch)
+                    }
+                yield format_event(event, data)
+        finally:
+            event_bus.unsubscribe(listener)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 
 @app.route('/transactions', methods=['GET'])
@@ -173,19 +268,24 @@ def add_transaction():
 
         return jsonify(response), 400
 
-    recipient = values['recipient']
+    recipient = to_address(values['recipient'])
     amount = values['amount']
-    signature = wallet.sign_transaction(wallet.public_key, recipient, amount)
-    success = blockchain.add_transaction(recipient, wallet.public_key, signature, amount)
+    inputs = blockchain.select_inputs(wallet.address, amount)
+    signature = wallet.sign_transaction(wallet.address, recipient, amount, inputs)
+    success = blockchain.add_transaction(recipient, wallet.address, signature, amount, inputs=inputs,
+                                         public_key=wallet.public_key, algorithm=wallet.algorithm)
 
     if success:
         response = {
             'message': 'Successfully added transaction.',
             'transaction': {
-                'sender': wallet.public_key,
+                'sender': wallet.address,
                 'recipient': recipient,
                 'amount': amount,
-                'signature': signature
+                'signature': signature,
+                'inputs': inputs or [],
+                'public_key': wallet.public_key,
+                'algorithm': wallet.algorithm
             },
             'funds': blockchain.get_balance()
         }
@@ -214,12 +314,20 @@ def broadcast_transaction():
             'message': 'Some data is missing'
         }
         return jsonify(response), 400
+    if not Verification.verify_transaction_format(values):
+        response = {
+            'message': 'Some data is malformed'
+        }
+        return jsonify(response), 400
 
     success = blockchain.add_transaction(values['recipient'],
                                          values['sender'],
                                          values['signature'],
                                          values['amount'],
-                                         True)
+                                         True,
+                                         values.get('inputs'),
+                                         values.get('public_key'),
+                                         values.get('algorithm'))
     if success:
         response = {
             'message': 'Successfully added transaction.',
@@ -227,7 +335,10 @@ def broadcast_transaction():
                 'sender': values['sender'],
                 'recipient': values['recipient'],
                 'amount': values['amount'],
-                'signature': values['signature']
+                'signature': values['signature'],
+                'inputs': values.get('inputs', []),
+                'public_key': values.get('public_key'),
+                'algorithm': values.get('algorithm')
             }
         }
 
@@ -240,6 +351,85 @@ def broadcast_transaction():
         return jsonify(response), 500
 
 
+@app.route('/transactions', methods=['POST'])
+def add_transactions():
+    if wallet.public_key is None:
+        response = {
+            'message': 'No wallet set up'
+        }
+
+        return jsonify(response), 400
+
+    values = request.get_json()
+    if not values or not isinstance(values.get('transactions'), list):
+        response = {
+            'message': 'No transactions found'
+        }
+
+        return jsonify(response), 400
+
+    if not all(isinstance(tx, dict) and isinstance(tx.get('recipient'), str)
+               and Verification.valid_amount(tx.get('amount')) for tx in values['transactions']):
+        response = {
+            'message': 'Required data is missing or malformed'
+        }
+
+        return jsonify(response), 400
+
+    transactions = []
+    selected_inputs = set()
+    for tx in values['transactions']:
+        recipient = to_address(tx['recipient'])
+        inputs = blockchain.select_inputs(wallet.address, tx['amount'], selected_inputs)
+        selected_inputs.update(inputs or [])
+        transactions.append({
+            'sender': wallet.address,
+            'recipient': recipient,
+            'amount': tx['amount'],
+            'signature': wallet.sign_transaction(wallet.address, recipient, tx['amount'], inputs),
+            'inputs': inputs or [],
+            'public_key': wallet.public_key,
+            'algorithm': wallet.algorithm
+        })
+    results = blockchain.add_transactions(transactions)
+    response = {
+        'message': 'Added {} of {} transactions.'.format(results.count(True), len(results)),
+        'results': [
+            {'success': success, 'transaction': tx} for tx, success in zip(transactions, results)
+        ],
+        'funds': blockchain.get_balance()
+    }
+
+    return jsonify(response), 201 if any(results) else 500
+
+
+@app.route('/broadcast-transactions', methods=['POST'])
+def broadcast_transactions():
+    values = request.get_json()
+    if not values or not isinstance(values.get('transactions'), list):
+        response = {
+            'message': 'No transactions found'
+        }
+        return jsonify(response), 400
+
+    required = ['sender', 'recipient', 'amount', 'signature']
+    if not all(isinstance(tx, dict) and all(key in tx for key in required) for tx in values['transactions']):
+        response = {
+            'message': 'Some data is missing'
+        }
+        return jsonify(response), 400
+
+    results = blockchain.add_transactions(values['transactions'], True)
+    response = {
+        'message': 'Added {} of {} transactions.'.format(results.count(True), len(results)),
+        'results': [
+            {'success': success, 'transaction': tx} for tx, success in zip(values['transactions'], results)
+        ]
+    }
+
+    return jsonify(response), 201 if any(results) else 500
+
+
 @app.route('/broadcast-block', methods=['POST'])
 def broadcast_block():
     values = request.get_json()
@@ -254,36 +444,28 @@ def broadcast_block():
         }
         return jsonify(response), 400
 
-    block = values['block']
-    if block['index'] == blockchain.chain[-1].index + 1:
-        if blockchain.add_block(block):
-            response = {
-                'message': 'Block added'
-            }
-            return jsonify(response), 201
-        else:
-            response = {
-                'message': 'Block seems invalid'
-            }
-            return jsonify(response), 409
-    elif block['index'] > blockchain.chain[-1].index:
-        response = {
-            'message': 'Blockchain seems to differ from local block chain, block not added'
-        }
-        blockchain.resolve_conflicts = True
-        return jsonify(response), 200
-    else:
-        response = {
-            'message': 'Blockchain seems to be shorter, block not added'
-        }
-        return jsonify(response), 409
+    message, status_code = block_response(blockchain.receive_block(values['block']))
+    response = {
+        'message': message
+    }
+    return jsonify(response), status_code
+
+
+@app.route('/health', methods=['GET'])
+def get_health():
+    response = {
+        'message': 'OK',
+        'pruned_height': blockchain.get_pruned_height()
+    }
+    return response, 200
 
 
 @app.route('/nodes', methods=['GET'])
 def get_nodes():
     nodes = blockchain.get_peer_nodes()
     response = {
-        'all_nodes': nodes
+        'all_nodes': nodes,
+        'peers': blockchain.get_peer_states()
     }
     return response, 200
 
@@ -330,14 +512,103 @@ def remove_node(node_url):
     return response, 200
 
 
-if __name__ == '__main__':
-    from argparse import ArgumentParser
+@app.route('/profile', methods=['POST'])
+def start_profile():
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        response = {
+            'message': 'Profiling can only be started from the node host'
+        }
+        return jsonify(response), 403
+
+    values = request.get_json(silent=True) or {}
+    try:
+        started = profiler.start(values.get('mode', SAMPLING),
+                                 values.get('duration'),
+                                 values.get('requests'),
+                                 values.get('interval', 0.005))
+    except (TypeError, ValueError) as error:
+        response = {
+            'message': str(error)
+        }
+        return jsonify(response), 400
+    if not started:
+        response = {
+            'message': 'Profiling is already running',
+            'profile': profiler.get_status()
+        }
+        return jsonify(response), 409
+
+    response = {
+        'message': 'Profiling started',
+        'profile': profiler.get_status()
+    }
+    return jsonify(response), 201
+
+
+@app.route('/profile', methods=['GET'])
+def get_profile():
+    response = {
+        'profile': profiler.get_status(),
+        'last_result': profiler.last_result
+    }
+    return jsonify(response), 200
+
 
-    parser = ArgumentParser()
-    parser.add_argument('-p', '--port', type=int, default=5050)
-    args = parser.parse_args()
+@app.route('/profile', methods=['DELETE'])
+def stop_profile():
+    if request.remote_addr not in LOCAL_ADDRESSES:
+        response = {
+            'message': 'Profiling can only be stopped from the node host'
+        }
+        return jsonify(response), 403
+
+    result = profiler.stop()
+    if result is None:
+        response = {
+            'message': 'Profiling is not running',
+            'last_result': profiler.last_result
+        }
+        return jsonify(response), 404
+
+    response = {
+        'message': 'Profiling stopped',
+        'result': result
+    }
+    return jsonify(response), 200
+
+
+if __name__ == '__main__':
+    args = node_argument_parser().parse_args()
     port = args.port
-    wallet = Wallet(port)
-    blockchain = Blockchain(wallet.public_key, port)
+    state_model = args.state_model
+    checkpoint_interval = args.checkpoint_interval
+    prune_depth = args.prune_depth
+    event_bus = EventBus()
+    peer_client = PeerClient(connect_timeout=args.connect_timeout,
+                             read_timeout=args.read_timeout,
+                             failure_threshold=args.failure_threshold,
+                             backoff_max=args.backoff_max)
+    wallet = Wallet(port, args.signature_algorithm)
+    journal = Journal('mempool-{}.journal'.format(port), args.journal_interval, args.journal_batch)
+    atexit.register(journal.close)
+    profiler = Profiler(port, args.profile_dir)
+    atexit.register(profiler.stop)
+    if args.profile is not None:
+        profiler.start(args.profile, args.profile_duration, args.profile_requests, args.profile_interval)
+    blockchain = Blockchain(wallet.public_key, port, peer_client, state_model, checkpoint_interval, event_bus,
+                            prune_depth, journal)
+
+    if args.bootstrap is not None and len(blockchain.chain) == 1:
+        blockchain.add_peer_node(args.bootstrap)
+        if blockchain.bootstrap(args.bootstrap, args.checkpoint_hash):
+            def backfill():
+                history = blockchain.fetch_history(args.bootstrap)
+                if history is None or not blockchain.add_history(history):
+                    print('Backfilling history from {} failed'.format(args.bootstrap))
+
+            if prune_depth is None:
+                threading.Thread(target=backfill, daemon=True).start()
+        else:
+            print('Bootstrapping from {} failed, starting from genesis'.format(args.bootstrap))
 
     app.run(host='0.0.0.0', port=port)
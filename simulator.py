@@ -0,0 +1,566 @@
+import heapq
+import json
+import os
+import random
+import tempfile
+from functools import partial
+from time import time
+
+from blockchain import BLOCK_ORPHAN, BLOCK_REORGANIZED, Blockchain
+from utility.async_peer_client import PeerResponse
+from utility.events import EventBus
+from utility.node_options import block_response
+from utility.signing import DEFAULT_ALGORITHM, SCHEMES
+from wallet import Wallet
+
+
+def block_key(block):
+    """
+    Identify a block without hashing it
+
+    :param block: Block or block dict
+    :return: tuple of index, previous hash and timestamp
+    """
+
+    if isinstance(block, dict):
+        return block['index'], block['previous_hash'], block['timestamp']
+
+    return block.index, block.previous_hash, block.timestamp
+
+
+def dict_chain(chain):
+    converted_chain = []
+    for block in chain:
+        dict_block = block.__dict__.copy()
+        dict_block['transactions'] = [tx.__dict__ for tx in dict_block['transactions']]
+        converted_chain.append(dict_block)
+    return converted_chain
+
+
+class SimulatedNetwork:
+    """
+    Delivers requests between in-process nodes on a virtual clock, with latency, loss and partitions
+    """
+
+    def __init__(self, latency=0.1, jitter=0.05, loss=0.0, seed=0):
+        """
+        Create a simulated network
+
+        :param latency: Mean one way delay of a message in virtual seconds
+        :param jitter: Maximum deviation from the mean delay
+        :param loss: Probability of a request being lost
+        :param seed: Seed of the random numbers, so runs can be repeated
+        """
+
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.now = 0.0
+        self.nodes = {}
+        self.partitions = None
+        self.sent = 0
+        self.dropped = 0
+        self.__queue = []
+        self.__sequence = 0
+
+    def delay(self):
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+
+    def schedule(self, delay, action, *args):
+        """
+        Run an action after a virtual delay
+
+        :param delay: Virtual seconds from now
+        :param action: Callable to run
+        """
+
+        self.__sequence += 1
+        heapq.heappush(self.__queue, (self.now + delay, self.__sequence, action, args))
+
+    def run_until(self, end=None):
+        """
+        Run the scheduled actions in order of their virtual time
+
+        :param end: Virtual time to stop at, None to run until nothing is scheduled
+        """
+
+        while len(self.__queue) > 0 and (end is None or self.__queue[0][0] <= end):
+            at, _, action, args = heapq.heappop(self.__queue)
+            self.now = at
+            action(*args)
+        if end is not None:
+            self.now = max(self.now, end)
+
+    def partition(self, groups):
+        """
+        Split the nodes into groups which cannot reach each other
+
+        :param groups: List of lists of node names
+        """
+
+        self.partitions = [set(group) for group in groups]
+
+    def heal(self):
+        self.partitions = None
+
+    def can_reach(self, source, target):
+        if target not in self.nodes:
+            return False
+        if self.partitions is None:
+            return True
+
+        return any(source in group and target in group for group in self.partitions)
+
+    def send(self, source, target, path, body=None):
+        """
+        Send a POST request from one node to another
+
+        The request is delivered after the network delay and answered with 202 right away.
+
+        :param source: Name of the sending node
+        :param target: Name of the receiving node
+        :param path: The route on the receiving node
+        :param body: JSON body of the request
+        :return: PeerResponse|None if the request is lost or the target cannot be reached
+        """
+
+        self.sent += 1
+        if not self.can_reach(source, target) or self.random.random() < self.loss:
+            self.dropped += 1
+            return None
+
+        self.schedule(self.delay(), self.__deliver, source, target, path, body)
+        return PeerResponse(202, {'message': 'Queued'})
+
+    def fetch(self, source, target, path, params, callback):
+        """
+        Send a GET request from one node to another and pass the response to a callback
+
+        The target answers once the request arrived after the network delay, and the callback gets the
+        response after a second delay. A lost request is reported as None after a round trip.
+
+        :param source: Name of the sending node
+        :param target: Name of the receiving node
+        :param path: The route on the receiving node
+        :param params: Query parameters of the request
+        :param callback: Callable taking the PeerResponse or None
+        """
+
+        self.sent += 1
+        if not self.can_reach(source, target) or self.random.random() < self.loss:
+            self.dropped += 1
+            self.schedule(2 * self.latency, callback, None)
+            return
+
+        self.schedule(self.delay(), self.__answer, source, target, path, params, callback)
+
+    def __answer(self, source, target, path, params, callback):
+        if not self.can_reach(source, target):
+            self.dropped += 1
+            self.schedule(self.latency, callback, None)
+            return
+
+        self.schedule(self.delay(), callback, self.nodes[target].handle('GET', path, params))
+
+    def __deliver(self, source, target, path, body):
+        if not self.can_reach(source, target):
+            self.dropped += 1
+            return
+
+        node = self.nodes[target]
+        response = node.handle('POST', path, body)
+        if response.status_code == 409 and path == '/broadcast-block':
+            # The sender only learns about the conflict once the response is back
+            self.schedule(self.delay(), self.__flag_conflict, source)
+        node.check_conflicts()
+
+    def __flag_conflict(self, name):
+        node = self.nodes[name]
+        node.blockchain.resolve_conflicts = True
+        node.check_conflicts()
+
+
+class SimulatedPeerClient:
+    """
+    Stand-in for PeerClient which sends requests through a SimulatedNetwork
+    """
+
+    def __init__(self, network, source):
+        self.network = network
+        self.source = source
+
+    def is_available(self, node):
+        return self.network.can_reach(self.source, node)
+
+    def request(self, method, node, path, **kwargs):
+        if method == 'GET':
+            # A blocking GET cannot wait for the virtual clock, nodes fetch with SimulatedNetwork.fetch instead
+            return None
+        return self.network.send(self.source, node, path, kwargs.get('json'))
+
+    def get(self, node, path, **kwargs):
+        return self.request('GET', node, path, **kwargs)
+
+    def post(self, node, path, **kwargs):
+        return self.request('POST', node, path, **kwargs)
+
+    def remove_peer(self, node):
+        pass
+
+    def get_peer_states(self, nodes):
+        return []
+
+
+class SimulatedNode:
+    """
+    A blockchain with a wallet, answering the peer routes of node.py
+    """
+
+    def __init__(self, name, network, state_model='account', algorithm=DEFAULT_ALGORITHM):
+        """
+        Create a node and register it with the network
+
+        :param name: The node name, used as node id and peer URL
+        :param network: The SimulatedNetwork the node is reachable on
+        :param state_model: 'account' or 'utxo', see Blockchain
+        :param algorithm: Signature algorithm of the node's wallet
+        """
+
+        self.name = name
+        self.network = network
+        self.wallet = Wallet(name, algorithm)
+        self.wallet.create_keys()
+        self.event_bus = EventBus()
+        self.blockchain = Blockchain(self.wallet.public_key,
+                                     name,
+                                     SimulatedPeerClient(network, name),
+                                     state_model,
+                                     event_bus=self.event_bus)
+        self.first_seen = {}
+        self.resolve_pending = False
+        self.resolve_times = []
+        self.resolve_durations = []
+        self.reorgs = 0
+        self.event_bus.subscribe(self.__on_event)
+        network.nodes[name] = self
+
+    def __on_event(self, event, data):
+        if event == 'block':
+            self.first_seen.setdefault(block_key(data), self.network.now)
+
+    def handle(self, method, path, body=None):
+        """
+        Answer a peer request like the matching node.py route
+
+        :param method: 'GET' or 'POST'
+        :param path: The route
+        :param body: JSON body of a POST request or query parameters of a GET request
+        :return: PeerResponse
+        """
+
+        blockchain = self.blockchain
+        if method == 'GET' and path == '/chain':
+            return PeerResponse(200, dict_chain(blockchain.chain))
+        if method == 'GET' and path == '/blocks':
+            return PeerResponse(200, dict_chain(blockchain.get_blocks_after(int((body or {}).get('from', -1)))))
+        if method == 'GET' and path == '/health':
+            return PeerResponse(200, {'message': 'OK'})
+        if method == 'POST' and path == '/broadcast-transaction':
+            success = blockchain.add_transaction(body['recipient'],
+                                                 body['sender'],
+                                                 body['signature'],
+                                                 body['amount'],
+                                                 True,
+                                                 body.get('inputs'),
+                                                 body.get('public_key'),
+                                                 body.get('algorithm'))
+            return PeerResponse(201 if success else 500, None)
+        if method == 'POST' and path == '/broadcast-transactions':
+            results = blockchain.add_transactions(body['transactions'], True)
+            return PeerResponse(201 if any(results) else 500, {'results': results})
+        if method == 'POST' and path == '/broadcast-block':
+            status = blockchain.receive_block(body['block'], False)
+            if status == BLOCK_ORPHAN:
+                self.fetch_parents(body['block'], blockchain.get_tip_hash(), blockchain.get_peer_nodes())
+            if status == BLOCK_REORGANIZED:
+                self.reorgs += 1
+            return PeerResponse(block_response(status)[1], None)
+
+        return PeerResponse(404, None)
+
+    def fetch_parents(self, orphan, tip_hash, peers):
+        """
+        Ask the peers one after another for their recent blocks until the parents of an orphan are known
+
+        :param orphan: The orphan block dict
+        :param tip_hash: Hash of the chain tip when the orphan was received
+        :param peers: The peers left to ask
+        """
+
+        if len(peers) < 1:
+            self.__settle_orphan(orphan, tip_hash)
+            return
+
+        def on_response(response):
+            if response is not None and response.status_code == 200 \
+                    and self.blockchain.add_parent_blocks(orphan, response.json()):
+                self.__settle_orphan(orphan, tip_hash)
+            else:
+                self.fetch_parents(orphan, tip_hash, peers[1:])
+
+        self.network.fetch(self.name, peers[0], '/blocks', {'from': self.blockchain.get_parents_height()},
+                           on_response)
+
+    def __settle_orphan(self, orphan, tip_hash):
+        if self.blockchain.settle_orphan(orphan, tip_hash) == BLOCK_REORGANIZED:
+            self.reorgs += 1
+        self.check_conflicts()
+
+    def check_conflicts(self):
+        """
+        Start a resolve once the node noticed its chain differs
+        """
+
+        if self.blockchain.resolve_conflicts:
+            self.resolve()
+
+    def resolve(self):
+        """
+        Fetch the chains of all peers over the network and replace the local chain with the longest valid one
+        once every answer arrived
+        """
+
+        if self.resolve_pending:
+            return
+        self.resolve_pending = True
+        started = self.network.now
+        peers = self.blockchain.get_peer_nodes()
+        pending = set(peers)
+        chains = []
+
+        def on_response(node, response):
+            pending.discard(node)
+            if response is not None and response.status_code == 200:
+                chains.append(response.json())
+            if len(pending) > 0:
+                return
+            start = time()
+            self.blockchain.replace_chain(chains)
+            self.resolve_times.append(time() - start)
+            self.resolve_durations.append(self.network.now - started)
+            self.resolve_pending = False
+
+        if len(peers) < 1:
+            on_response(None, None)
+        for node in peers:
+            self.network.fetch(self.name, node, '/chain', None, partial(on_response, node))
+
+
+class Simulation:
+    """
+    Runs a cluster of in-process nodes under a load of signed transactions and mining
+    """
+
+    def __init__(self, nodes=4, latency=0.1, jitter=0.05, loss=0.0, tx_rate=5.0, block_interval=10.0,
+                 state_model='account', algorithm=DEFAULT_ALGORITHM, seed=0):
+        """
+        Create the nodes, connect them to each other and give every wallet mining rewards to spend
+
+        :param nodes: Number of nodes
+        :param latency: Mean one way delay of a message in virtual seconds
+        :param jitter: Maximum deviation from the mean delay
+        :param loss: Probability of a request being lost
+        :param tx_rate: Transactions submitted per virtual second, over all nodes
+        :param block_interval: Mean virtual seconds between blocks, over all nodes
+        :param state_model: 'account' or 'utxo', see Blockchain
+        :param algorithm: Signature algorithm of the wallets
+        :param seed: Seed of the random numbers, so runs can be repeated
+        """
+
+        self.network = SimulatedNetwork(latency, jitter, loss, seed)
+        self.random = random.Random(seed)
+        self.tx_rate = tx_rate
+        self.block_interval = block_interval
+        self.nodes = [SimulatedNode('sim-{}'.format(i), self.network, state_model, algorithm) for i in range(nodes)]
+        self.mined = {}
+        self.submitted = 0
+        self.accepted = 0
+        self.duration = 0
+
+        for node in self.nodes:
+            for peer in self.nodes:
+                if peer is not node:
+                    node.blockchain.add_peer_node(peer.name)
+        for node in self.nodes:
+            block = node.blockchain.mine_block(broadcast=False)
+            for peer in self.nodes:
+                if peer is not node:
+                    peer.blockchain.add_block(dict_chain([block])[0])
+        self.start_height = self.nodes[0].blockchain.chain[-1].index
+
+    def __submit(self):
+        if self.network.now >= self.duration:
+            return
+        self.network.schedule(self.random.expovariate(self.tx_rate), self.__submit)
+
+        node = self.random.choice(self.nodes)
+        recipient = self.random.choice([peer for peer in self.nodes if peer is not node])
+        wallet = node.wallet
+        amount = 1
+        self.submitted += 1
+        if node.blockchain.get_balance() < amount:
+            return
+
+        inputs = node.blockchain.select_inputs(wallet.address, amount)
+        results = node.blockchain.add_transactions([{
+            'sender': wallet.address,
+            'recipient': recipient.wallet.address,
+            'amount': amount,
+            'signature': wallet.sign_transaction(wallet.address, recipient.wallet.address, amount, inputs),
+            'inputs': inputs or [],
+            'public_key': wallet.public_key,
+            'algorithm': wallet.algorithm
+        }])
+        self.accepted += results.count(True)
+
+    def __mine(self, node):
+        if self.network.now >= self.duration:
+            return
+        self.network.schedule(self.random.expovariate(1 / (self.block_interval * len(self.nodes))), self.__mine, node)
+
+        if node.blockchain.resolve_conflicts:
+            # Like /mine, refuse to mine until the conflict is resolved
+            node.check_conflicts()
+            return
+        block = node.blockchain.mine_block()
+        if block is not None:
+            self.mined[block_key(block)] = self.network.now
+
+    def run(self, duration=60.0, partition=None, heal_at=None):
+        """
+        Run the load for a virtual duration, then heal the network and resolve until all nodes agree
+
+        :param duration: Virtual seconds to generate load for
+        :param partition: Lists of node indexes which can only reach each other, None for no partition
+        :param heal_at: Virtual time the partition ends, defaults to the end of the load
+        :return: report dict
+        """
+
+        start = time()
+        self.duration = duration
+        if partition is not None:
+            self.network.partition([[self.nodes[i].name for i in group] for group in partition])
+            self.network.schedule(duration if heal_at is None else heal_at, self.network.heal)
+        self.network.schedule(0, self.__submit)
+        for node in self.nodes:
+            self.network.schedule(self.random.expovariate(1 / (self.block_interval * len(self.nodes))),
+                                  self.__mine, node)
+        self.network.run_until(duration)
+        self.network.heal()
+        self.network.run_until()
+        load_time = time() - start
+
+        convergence_start = self.network.now
+        rounds = 0
+        while not self.converged() and rounds < len(self.nodes):
+            rounds += 1
+            for node in self.nodes:
+                node.resolve()
+            self.network.run_until()
+
+        return self.report(duration, load_time, rounds, self.network.now - convergence_start)
+
+    def converged(self):
+        return len({block_key(node.blockchain.chain[-1]) for node in self.nodes}) == 1
+
+    def report(self, duration, load_time, rounds, convergence_time):
+        """
+        Collect the metrics of a run
+
+        :return: report dict
+        """
+
+        chain = self.nodes[0].blockchain.chain
+        final_keys = {block_key(block) for block in chain}
+        confirmed = sum(
+            len(block.transactions) - 1 for block in chain if block.index > self.start_height
+        )
+        propagation = []
+        for key, mined_at in self.mined.items():
+            if key not in final_keys:
+                continue
+            seen = [node.first_seen.get(key) for node in self.nodes]
+            if all(seen_at is not None for seen_at in seen):
+                propagation.append(max(seen) - mined_at)
+        resolve_times = [t for node in self.nodes for t in node.resolve_times]
+        resolve_durations = [t for node in self.nodes for t in node.resolve_durations]
+        forked = len([key for key in self.mined if key not in final_keys])
+
+        return {
+            'nodes': len(self.nodes),
+            'virtual_duration': duration,
+            'wall_time': round(load_time, 3),
+            'submitted_transactions': self.submitted,
+            'accepted_transactions': self.accepted,
+            'confirmed_transactions': confirmed,
+            'offered_tps': round(self.submitted / duration, 3),
+            'confirmed_tps': round(confirmed / duration, 3),
+            'tps_wall': round(confirmed / load_time, 3) if load_time > 0 else None,
+            'blocks_mined': len(self.mined),
+            'fork_rate': round(forked / len(self.mined), 3) if len(self.mined) > 0 else 0,
+            'block_propagation_mean': round(sum(propagation) / len(propagation), 3) if propagation else None,
+            'block_propagation_max': round(max(propagation), 3) if propagation else None,
+            'messages_sent': self.network.sent,
+            'messages_dropped': self.network.dropped,
+            'reorgs': sum(node.reorgs for node in self.nodes),
+            'resolves': len(resolve_times),
+            'resolve_time_mean':
+                round(sum(resolve_durations) / len(resolve_durations), 3) if resolve_durations else None,
+            'resolve_wall_mean': round(sum(resolve_times) / len(resolve_times), 4) if resolve_times else None,
+            'convergence_rounds': rounds,
+            'convergence_time': round(convergence_time, 3),
+            'converged': self.converged()
+        }
+
+
+def parse_partition(value):
+    """
+    Parse a partition like '0,1;2,3' into lists of node indexes
+
+    :param value: Groups separated by ';' of node indexes separated by ','
+    :return: list of lists of ints
+    """
+
+    return [[int(index) for index in group.split(',')] for group in value.split(';')]
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Run a cluster of in-process nodes on a simulated network')
+    parser.add_argument('-n', '--nodes', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=60.0, help='Virtual seconds to generate load for')
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--jitter', type=float, default=0.05)
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--tx-rate', type=float, default=5.0, help='Transactions per virtual second')
+    parser.add_argument('--block-interval', type=float, default=10.0, help='Mean virtual seconds between blocks')
+    parser.add_argument('--partition', type=parse_partition,
+                        help="Groups of node indexes which only reach each other, e.g. '0,1;2,3'")
+    parser.add_argument('--heal-at', type=float, help='Virtual time the partition ends')
+    parser.add_argument('--state-model', choices=['account', 'utxo'], default='account')
+    parser.add_argument('--signature-algorithm', choices=sorted(SCHEMES), default=DEFAULT_ALGORITHM)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # Nodes save their files to the working directory, so keep them out of the repository
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as data_directory:
+        os.chdir(data_directory)
+        try:
+            simulation = Simulation(args.nodes, args.latency, args.jitter, args.loss, args.tx_rate,
+                                    args.block_interval, args.state_model, args.signature_algorithm, args.seed)
+            print(json.dumps(simulation.run(args.duration, args.partition, args.heal_at), indent=2))
+        finally:
+            os.chdir(working_directory)
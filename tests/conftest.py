@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from block import Block  # noqa: E402
+from utility.verification import Verification  # noqa: E402
+from wallet import Wallet  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def node_dir(tmp_path, monkeypatch):
+    # Blockchain and Wallet write their files to the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def make_wallet():
+    def make(node_id):
+        wallet = Wallet(node_id)
+        wallet.create_keys()
+        return wallet
+
+    return make
+
+
+def dict_block(block):
+    dict_block = block.__dict__.copy()
+    dict_block['transactions'] = [tx.__dict__ for tx in dict_block['transactions']]
+    return dict_block
+
+
+def forge_block(index, previous_hash, transactions, timestamp=None):
+    """
+    Find a proof for a block the way a peer would, without any checks on its transactions
+    """
+
+    proof = 0
+    while not Verification.valid_proof(transactions[:-1], previous_hash, proof):
+        proof += 1
+    return Block(index, previous_hash, transactions, proof, timestamp)
+
+
+def pay(blockchain, wallet, recipient, amount):
+    """
+    Sign a payment from a wallet and add it to the open transactions of a blockchain
+    """
+
+    inputs = blockchain.select_inputs(wallet.address, amount)
+    signature = wallet.sign_transaction(wallet.address, recipient, amount, inputs)
+    return blockchain.add_transaction(recipient, wallet.address, signature, amount, inputs=inputs,
+                                      public_key=wallet.public_key, algorithm=wallet.algorithm)
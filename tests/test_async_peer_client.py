@@ -0,0 +1,30 @@
+import asyncio
+from time import time
+
+from utility.async_peer_client import AsyncPeerClient
+from utility.peer_client import OPEN
+
+
+def test_cancelled_probe_reopens_the_circuit():
+    async def run():
+        async def never_answer(reader, writer):
+            await asyncio.sleep(10)
+
+        server = await asyncio.start_server(never_answer, '127.0.0.1', 0)
+        node = '127.0.0.1:{}'.format(server.sockets[0].getsockname()[1])
+        client = AsyncPeerClient(failure_threshold=1)
+        state = client.get_state(node)
+        state.record_failure('down')
+        state.retry_at = 0
+
+        probe = asyncio.ensure_future(client.is_available(node))
+        await asyncio.sleep(0.2)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        await client.close()
+        server.close()
+        return state
+
+    state = asyncio.run(run())
+    assert state.state == OPEN
+    assert state.retry_at > time()
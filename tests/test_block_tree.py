@@ -0,0 +1,79 @@
+import pytest
+
+import blockchain as blockchain_module
+from blockchain import BLOCK_ADDED, BLOCK_KNOWN, BLOCK_REORGANIZED, BLOCK_STALE, BLOCK_STORED, Blockchain
+from conftest import dict_block, forge_block, pay
+from transaction import Transaction
+from utility.hash_util import hash_block
+
+
+def branch(parent, owner, length, timestamp=None):
+    """
+    Forge a branch of blocks paying the mining reward to an owner
+    """
+
+    blocks = []
+    for _ in range(length):
+        parent = forge_block(parent.index + 1, hash_block(parent), [Transaction('MINING', owner, '', 10)],
+                             timestamp)
+        blocks.append(parent)
+    return blocks
+
+
+@pytest.mark.parametrize('state_model', ['account', 'utxo'])
+def test_reorg_rolls_back_balances(make_wallet, state_model):
+    miner = make_wallet('miner')
+    rival = make_wallet('rival')
+    recipient = make_wallet('recipient')
+    blockchain = Blockchain(miner.public_key, 'node', state_model=state_model)
+    blockchain.mine_block(broadcast=False)
+    fork = blockchain.chain[-1]
+    assert pay(blockchain, miner, recipient.address, 4)
+    blockchain.mine_block(broadcast=False)
+    assert blockchain.get_balance(miner.address) == 16
+    assert blockchain.get_balance(recipient.address) == 4
+
+    first, second = branch(fork, rival.address, 2)
+    assert blockchain.receive_block(dict_block(first)) == BLOCK_STORED
+    assert blockchain.receive_block(dict_block(second)) == BLOCK_REORGANIZED
+
+    assert hash_block(blockchain.chain[-1]) == hash_block(second)
+    assert blockchain.get_balance(miner.address) == 6
+    assert blockchain.get_balance(rival.address) == 20
+    assert blockchain.get_balance(recipient.address) == 0
+    assert [tx.recipient for tx in blockchain.get_open_transactions()] == [recipient.address]
+
+
+def test_side_block_with_a_new_timestamp_is_known(make_wallet):
+    miner = make_wallet('miner')
+    blockchain = Blockchain(miner.public_key, 'node')
+    blockchain.mine_block(broadcast=False)
+    fork = blockchain.chain[-1]
+    blockchain.mine_block(broadcast=False)
+
+    side_block, = branch(fork, 'rival', 1, timestamp=1)
+    assert blockchain.receive_block(dict_block(side_block)) == BLOCK_STORED
+    side_block.timestamp = 2
+    assert blockchain.receive_block(dict_block(side_block)) == BLOCK_KNOWN
+
+    main_block = blockchain.chain[-1]
+    main_block.timestamp += 1
+    assert blockchain.receive_block(dict_block(main_block)) == BLOCK_KNOWN
+
+
+def test_side_blocks_are_capped(make_wallet, monkeypatch):
+    monkeypatch.setattr(blockchain_module, 'MAX_SIDE_BLOCKS', 3)
+    blockchain = Blockchain(make_wallet('miner').public_key, 'node')
+    blockchain.mine_block(broadcast=False)
+    for _ in range(5):
+        blockchain.mine_block(broadcast=False)
+    chain = blockchain.chain
+
+    side_blocks = [branch(chain[index], 'rival-{}'.format(index), 1)[0] for index in range(1, 5)]
+    for side_block in side_blocks:
+        assert blockchain.receive_block(dict_block(side_block)) == BLOCK_STORED
+    # The lowest side block was dropped and is dropped again when sent once more
+    assert blockchain.receive_block(dict_block(side_blocks[0])) == BLOCK_STALE
+    assert blockchain.receive_block(dict_block(side_blocks[-1])) == BLOCK_KNOWN
+    assert blockchain.get_balance('rival-1') == 0
+    assert blockchain.receive_block(dict_block(branch(chain[-1], 'tip', 1)[0])) == BLOCK_ADDED
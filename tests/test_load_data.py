@@ -0,0 +1,38 @@
+import json
+
+from blockchain import Blockchain
+from utility.hash_util import hash_string_256
+
+
+def test_old_format_data_starts_a_new_chain(make_wallet, capsys):
+    wallet = make_wallet('node')
+    genesis = {'index': 0, 'previous_hash': '', 'transactions': [], 'proof': 100, 'timestamp': 0}
+    # Blocks and signatures as the code before addresses and Merkle roots saved them
+    old_hash = hash_string_256(json.dumps(genesis, sort_keys=True).encode())
+    reward = {'sender': 'MINING', 'recipient': wallet.public_key, 'signature': '', 'amount': 10}
+    block = {'index': 1, 'previous_hash': old_hash, 'transactions': [reward], 'proof': 7, 'timestamp': 1}
+    payment = {'sender': wallet.public_key, 'recipient': 'someone', 'signature': '00', 'amount': 1}
+    with open('blockchain-node.txt', mode='w') as file:
+        file.write('{}\n{}\n{}'.format(json.dumps([genesis, block]), json.dumps([payment]), json.dumps(['peer:5001'])))
+
+    blockchain = Blockchain(wallet.public_key, 'node')
+
+    assert 'older block format' in capsys.readouterr().out
+    assert len(blockchain.chain) == 1
+    assert blockchain.get_open_transactions() == []
+    assert blockchain.get_peer_nodes() == ['peer:5001']
+    assert blockchain.mine_block(broadcast=False) is not None
+
+
+def test_saved_data_loads_without_warnings(make_wallet, capsys):
+    wallet = make_wallet('node')
+    blockchain = Blockchain(wallet.public_key, 'node')
+    blockchain.mine_block(broadcast=False)
+    blockchain.mine_block(broadcast=False)
+    capsys.readouterr()
+
+    loaded = Blockchain(wallet.public_key, 'node')
+
+    assert 'Warning' not in capsys.readouterr().out
+    assert len(loaded.chain) == 3
+    assert loaded.get_balance() == 20
@@ -0,0 +1,33 @@
+import pytest
+
+from blockchain import BLOCK_ADDED, BLOCK_INVALID, BLOCK_KNOWN, BLOCK_ORPHAN, BLOCK_STALE, Blockchain
+from utility.node_options import block_response, node_argument_parser
+
+
+def test_block_statuses_map_to_http_statuses():
+    assert block_response(BLOCK_ADDED)[1] == 201
+    assert block_response(BLOCK_ORPHAN)[1] == 202
+    assert block_response(BLOCK_KNOWN)[1] == 200
+    assert block_response(BLOCK_STALE)[1] == 409
+    assert block_response(BLOCK_INVALID) == ('Block seems invalid', 409)
+
+
+def test_node_arguments_have_defaults():
+    args = node_argument_parser().parse_args(['-p', '5001'])
+
+    assert args.port == 5001
+    assert args.state_model == 'account'
+    assert args.prune_depth is None
+
+
+@pytest.mark.parametrize('value', ['0', '-3', 'many'])
+def test_prune_depth_must_be_positive(value, capsys):
+    with pytest.raises(SystemExit):
+        node_argument_parser().parse_args(['--prune-depth', value])
+    assert '--prune-depth' in capsys.readouterr().err
+
+
+def test_blockchain_rejects_prune_depth_below_one():
+    with pytest.raises(ValueError):
+        Blockchain(None, 'node', prune_depth=0)
+    assert Blockchain(None, 'node', prune_depth=1).prune_depth == 1
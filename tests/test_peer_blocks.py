@@ -0,0 +1,45 @@
+import pytest
+
+from blockchain import BLOCK_INVALID, Blockchain
+from conftest import dict_block, forge_block
+from transaction import Transaction
+from utility.hash_util import hash_block, to_address
+
+
+@pytest.mark.parametrize('state_model', ['account', 'utxo'])
+def test_block_with_forged_signature_is_rejected(make_wallet, state_model):
+    victim = make_wallet('victim')
+    thief = make_wallet('thief')
+    blockchain = Blockchain(victim.public_key, 'node', state_model=state_model)
+    blockchain.mine_block(broadcast=False)
+
+    tip = blockchain.chain[-1]
+    inputs = ['1:0:0'] if state_model == 'utxo' else None
+    theft = Transaction(victim.address, thief.address, '00', 10, inputs, victim.public_key, victim.algorithm)
+    block = forge_block(tip.index + 1, hash_block(tip),
+                        [theft, Transaction('MINING', to_address(thief.public_key), '', 10)])
+
+    assert blockchain.receive_block(dict_block(block)) == BLOCK_INVALID
+    assert blockchain.add_block(dict_block(block)) is False
+    assert blockchain.chain[-1].index == tip.index
+    assert blockchain.get_balance(victim.address) == 10
+    assert blockchain.get_balance(thief.address) == 0
+
+
+def test_block_with_valid_signature_is_added(make_wallet):
+    sender = make_wallet('sender')
+    recipient = make_wallet('recipient')
+    blockchain = Blockchain(sender.public_key, 'node', state_model='utxo')
+    blockchain.mine_block(broadcast=False)
+
+    tip = blockchain.chain[-1]
+    inputs = blockchain.select_inputs(sender.address, 4)
+    signature = sender.sign_transaction(sender.address, recipient.address, 4, inputs)
+    payment = Transaction(sender.address, recipient.address, signature, 4, inputs, sender.public_key,
+                          sender.algorithm)
+    block = forge_block(tip.index + 1, hash_block(tip),
+                        [payment, Transaction('MINING', to_address(recipient.public_key), '', 10)])
+
+    assert blockchain.receive_block(dict_block(block)) != BLOCK_INVALID
+    assert blockchain.get_balance(sender.address) == 6
+    assert blockchain.get_balance(recipient.address) == 14
@@ -0,0 +1,62 @@
+import pytest
+
+from blockchain import Blockchain
+from conftest import dict_block, forge_block, pay
+from transaction import Transaction
+from utility.hash_util import hash_block, hash_snapshot
+
+
+def snapshot_node(make_wallet, state_model):
+    """
+    Build a node whose snapshot at height 2 holds an open transaction that block 3 mines
+    """
+
+    miner = make_wallet('miner')
+    other = make_wallet('other')
+    blockchain = Blockchain(miner.public_key, 'source', state_model=state_model, checkpoint_interval=2)
+    blockchain.mine_block(broadcast=False)
+    assert pay(blockchain, miner, other.address, 3)
+
+    tip = blockchain.chain[-1]
+    block = forge_block(tip.index + 1, hash_block(tip), [Transaction('MINING', other.address, '', 10)])
+    assert blockchain.add_block(dict_block(block))
+    assert len(blockchain.get_snapshot()['open_transactions']) == 1
+
+    blockchain.mine_block(broadcast=False)
+    assert blockchain.get_open_transactions() == []
+    return blockchain, miner, other
+
+
+@pytest.mark.parametrize('state_model', ['account', 'utxo'])
+def test_bootstrap_drops_open_transactions_mined_after_the_snapshot(make_wallet, state_model):
+    source, miner, other = snapshot_node(make_wallet, state_model)
+    snapshot = source.get_snapshot()
+
+    blockchain = Blockchain(make_wallet('node').public_key, 'node', state_model=state_model)
+    blocks = [dict_block(block) for block in source.get_blocks_after(snapshot['height'])]
+    assert blockchain.load_snapshot(snapshot, blocks, snapshot['hash'])
+
+    assert blockchain.get_open_transactions() == []
+    assert blockchain.get_balance(miner.address) == source.get_balance(miner.address) == 17
+    assert blockchain.get_balance(other.address) == source.get_balance(other.address) == 13
+    assert blockchain.chain[-1].index == source.chain[-1].index
+
+
+@pytest.mark.parametrize('state_model', ['account', 'utxo'])
+def test_history_must_lead_to_the_snapshot_balances(make_wallet, state_model):
+    source, miner, other = snapshot_node(make_wallet, state_model)
+    snapshot = source.get_snapshot()
+    blocks = [dict_block(block) for block in source.get_blocks_after(snapshot['height'])]
+    history = [dict_block(block) for block in source.chain]
+
+    forged = dict(snapshot, balances=dict(snapshot['balances'], **{miner.address: 1000}))
+    forged['hash'] = hash_snapshot(forged)
+    blockchain = Blockchain(make_wallet('node').public_key, 'forged', state_model=state_model)
+    assert blockchain.load_snapshot(forged, blocks)
+    assert not blockchain.add_history(history)
+    assert blockchain.chain[0].index == snapshot['height']
+
+    blockchain = Blockchain(make_wallet('node').public_key, 'honest', state_model=state_model)
+    assert blockchain.load_snapshot(snapshot, blocks)
+    assert blockchain.add_history(history)
+    assert [hash_block(block) for block in blockchain.chain] == [hash_block(block) for block in source.chain]
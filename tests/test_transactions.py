@@ -0,0 +1,45 @@
+import pytest
+
+from blockchain import Blockchain
+from conftest import pay
+
+
+def signed(wallet, recipient, amount):
+    return {
+        'sender': wallet.address,
+        'recipient': recipient,
+        'amount': amount,
+        'signature': wallet.sign_transaction(wallet.address, recipient, amount),
+        'public_key': wallet.public_key,
+        'algorithm': wallet.algorithm
+    }
+
+
+def test_malformed_batch_items_are_rejected_one_by_one(make_wallet):
+    wallet = make_wallet('node')
+    blockchain = Blockchain(wallet.public_key, 'node')
+    blockchain.mine_block(broadcast=False)
+
+    valid = signed(wallet, 'someone', 2)
+    string_amount = dict(signed(wallet, 'someone', 3), amount='3')
+    numeric_sender = dict(signed(wallet, 'someone', 3), sender=5)
+    unsigned = dict(signed(wallet, 'someone', 3), signature=None)
+    results = blockchain.add_transactions([string_amount, 'transaction', numeric_sender, unsigned, None, valid], True)
+
+    assert results == [False, False, False, False, False, True]
+    assert len(blockchain.get_open_transactions()) == 1
+    assert blockchain.get_balance() == 8
+
+
+@pytest.mark.parametrize('state_model', ['account', 'utxo'])
+def test_forged_batch_item_is_rejected_before_funds_count(make_wallet, state_model):
+    wallet = make_wallet('node')
+    blockchain = Blockchain(wallet.public_key, 'node', state_model=state_model)
+    blockchain.mine_block(broadcast=False)
+    assert pay(blockchain, wallet, 'someone', 1)
+
+    forged = dict(signed(wallet, 'thief', 9), signature='00')
+    results = blockchain.add_transactions([forged], True)
+
+    assert results == [False]
+    assert blockchain.get_balance() == 9
@@ -0,0 +1,47 @@
+from block import Block
+from transaction import Transaction
+from utxo_set import UtxoSet
+
+
+def reward(owner, amount=10):
+    return Transaction('MINING', owner, '', amount)
+
+
+def test_apply_and_undo_block_restores_outputs():
+    utxo_set = UtxoSet()
+    assert utxo_set.apply_block(Block(1, '', [reward('alice')], 0)) == []
+
+    spend = Transaction('alice', 'bob', 'sig', 4, ['1:0:0'])
+    block = Block(2, '', [spend, reward('carol')], 0)
+    before = utxo_set.to_dict()
+    undo = utxo_set.apply_block(block)
+
+    assert utxo_set.balance('alice') == 6
+    assert utxo_set.balance('bob') == 4
+    assert utxo_set.balance('carol') == 10
+    assert utxo_set.get('1:0:0') is None
+
+    utxo_set.undo_block(block, undo)
+    assert utxo_set.to_dict() == before
+    assert utxo_set.balance('bob') == 0
+
+
+def test_apply_block_is_all_or_nothing():
+    utxo_set = UtxoSet()
+    utxo_set.apply_block(Block(1, '', [reward('alice')], 0))
+    before = utxo_set.to_dict()
+
+    first = Transaction('alice', 'bob', 'sig', 4, ['1:0:0'])
+    double_spend = Transaction('alice', 'carol', 'sig', 4, ['1:0:0'])
+    assert utxo_set.apply_block(Block(2, '', [first, double_spend, reward('alice')], 0)) is None
+    assert utxo_set.to_dict() == before
+
+
+def test_validate_transaction_rejects_foreign_outputs():
+    utxo_set = UtxoSet()
+    utxo_set.apply_block(Block(1, '', [reward('alice')], 0))
+
+    assert utxo_set.validate_transaction(Transaction('alice', 'bob', 'sig', 10, ['1:0:0']))
+    assert not utxo_set.validate_transaction(Transaction('mallory', 'bob', 'sig', 10, ['1:0:0']))
+    assert not utxo_set.validate_transaction(Transaction('alice', 'bob', 'sig', 11, ['1:0:0']))
+    assert not utxo_set.validate_transaction(Transaction('alice', 'bob', 'sig', 1, ['1:0:0']), spent={'1:0:0'})
@@ -1,9 +1,14 @@
+import hashlib
+import json
 from collections import OrderedDict
 from utility.printable import Printable
 
 
 class Transaction(Printable):
-    def __init__(self, sender, recipient, signature, amount):
+    # Cached encoding and id live in slots so they stay out of __dict__, which is the JSON form of a transaction
+    __slots__ = ('__encoding', '__id')
+
+    def __init__(self, sender, recipient, signature, amount, inputs=None, public_key=None, algorithm=None):
         """
         A Transaction which can be added to a block in the blockchain
 
@@ -11,12 +16,54 @@ class Transaction(Printable):
         :param recipient: The receiver of the coins
         :param signature: The signature of the transaction
         :param amount: The amount of coins sent
+        :param inputs: Outpoints spent by the transaction (UTXO state model only)
+        :param public_key: Public key of the sender, if the sender is given as an address
+        :param algorithm: The signature algorithm, None for RSA
         """
 
         self.sender = sender
         self.recipient = recipient
         self.amount = amount
         self.signature = signature
+        self.inputs = [] if inputs is None else inputs
+        self.public_key = public_key
+        self.algorithm = algorithm
+        self.__encoding = None
+        self.__id = None
+
+    def encode(self):
+        """
+        Canonical byte encoding of everything but the signature, used for signing, the transaction id,
+        Merkle leaves and proof of work
+
+        It is computed once, so a transaction must not be changed after it is created.
+
+        :return: bytes
+        """
+
+        if self.__encoding is None:
+            self.__encoding = json.dumps([
+                self.sender,
+                self.recipient,
+                repr(float(self.amount)),
+                self.inputs,
+                self.public_key,
+                self.algorithm
+            ], separators=(',', ':')).encode()
+
+        return self.__encoding
+
+    def tx_id(self):
+        """
+        Get the id of the transaction, the SHA256 of its encoding
+
+        :return: hex string
+        """
+
+        if self.__id is None:
+            self.__id = hashlib.sha256(self.encode()).hexdigest()
+
+        return self.__id
 
     def to_ordered_dict(self):
         """
@@ -25,8 +72,33 @@ class Transaction(Printable):
         :return:
         """
 
-        return OrderedDict([
+        ordered_dict = OrderedDict([
             ('sender', self.sender),
             ('recipient', self.recipient),
             ('amount', self.amount)
         ])
+        if self.inputs:
+            ordered_dict['inputs'] = self.inputs
+        if self.public_key is not None:
+            ordered_dict['public_key'] = self.public_key
+        if self.algorithm is not None:
+            ordered_dict['algorithm'] = self.algorithm
+
+        return ordered_dict
+
+    @classmethod
+    def from_dict(cls, transaction):
+        """
+        Create a Transaction from its dict form, as saved to file or sent between nodes
+
+        :param transaction: The transaction dict
+        :return: Transaction
+        """
+
+        return cls(transaction['sender'],
+                   transaction['recipient'],
+                   transaction['signature'],
+                   transaction['amount'],
+                   transaction.get('inputs'),
+                   transaction.get('public_key'),
+                   transaction.get('algorithm'))
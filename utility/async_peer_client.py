@@ -0,0 +1,152 @@
+import asyncio
+
+import aiohttp
+
+from utility.peer_client import PeerState, HALF_OPEN
+
+
+class PeerResponse:
+    """
+    The status and decoded body of a peer response, read before the connection is released
+    """
+
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class AsyncPeerClient:
+    """
+    Non-blocking counterpart of PeerClient, sharing its circuit breaking rules
+    """
+
+    def __init__(self, connect_timeout=2.0, read_timeout=10.0, failure_threshold=3, backoff_base=1.0,
+                 backoff_max=60.0, pool_size=4, health_path='/health'):
+        """
+        Create an async peer client
+
+        :param connect_timeout: Seconds to wait for a connection to a peer
+        :param read_timeout: Seconds to wait for a peer response
+        :param failure_threshold: Consecutive failures before a peer is skipped
+        :param backoff_base: Seconds to skip a peer after its circuit opens
+        :param backoff_max: Upper limit of the time a peer is skipped for
+        :param pool_size: Number of pooled connections kept per peer
+        :param health_path: Route used to probe a skipped peer
+        """
+
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.health_path = health_path
+        self.__session = None
+        self.__states = {}
+
+    def __get_session(self):
+        if self.__session is None or self.__session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_size)
+            self.__session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.__session
+
+    def get_state(self, node):
+        """
+        Get the health state of a peer, creating it if missing
+
+        :param node: The node URL
+        :return: PeerState
+        """
+
+        if node not in self.__states:
+            self.__states[node] = PeerState(node, self.failure_threshold, self.backoff_base, self.backoff_max)
+        return self.__states[node]
+
+    async def __probe(self, node, state):
+        state.state = HALF_OPEN
+        try:
+            async with self.__get_session().get('http://{}{}'.format(node, self.health_path)) as response:
+                response.raise_for_status()
+            state.record_success()
+            return True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            state.record_failure(error)
+            return False
+        finally:
+            # A cancelled probe must not leave the peer half-open, as no further request would probe it
+            if state.state == HALF_OPEN:
+                state.record_failure('Health probe did not finish')
+
+    async def is_available(self, node):
+        """
+        Check if a peer may be contacted, sending a health probe if its backoff has passed
+
+        :param node: The node URL
+        :return: boolean
+        """
+
+        state = self.get_state(node)
+        if state.needs_probe():
+            return await self.__probe(node, state)
+
+        return state.allow_request()
+
+    async def request(self, method, node, path, **kwargs):
+        """
+        Send a request to a peer
+
+        :param method: The HTTP method
+        :param node: The node URL
+        :param path: The route on the peer, e.g. '/chain'
+        :return: PeerResponse|None if the peer is skipped or unreachable
+        """
+
+        if not await self.is_available(node):
+            return None
+
+        state = self.get_state(node)
+        try:
+            async with self.__get_session().request(method, 'http://{}{}'.format(node, path), **kwargs) as response:
+                try:
+                    body = await response.json(content_type=None)
+                except ValueError:
+                    body = None
+                peer_response = PeerResponse(response.status, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            print('Request to {} failed: {}'.format(node, repr(error)))
+            state.record_failure(error)
+            return None
+
+        state.record_success()
+        return peer_response
+
+    async def get(self, node, path, **kwargs):
+        return await self.request('GET', node, path, **kwargs)
+
+    async def post(self, node, path, **kwargs):
+        return await self.request('POST', node, path, **kwargs)
+
+    def remove_peer(self, node):
+        """
+        Forget the state of a peer
+
+        :param node: The node URL
+        """
+
+        self.__states.pop(node, None)
+
+    def get_peer_states(self, nodes):
+        """
+        Get the health state of the supplied peers
+
+        :param nodes: The node URLs
+        :return: list of state dicts
+        """
+
+        return [self.get_state(node).to_dict() for node in nodes]
+
+    async def close(self):
+        if self.__session is not None:
+            await self.__session.close()
@@ -0,0 +1,63 @@
+import json
+import threading
+
+
+class EventBus:
+    """
+    Passes blockchain events to subscribed listeners, e.g. open event streams
+    """
+
+    def __init__(self):
+        self.__listeners = []
+        self.__lock = threading.Lock()
+
+    def subscribe(self, listener):
+        """
+        Register a listener
+
+        :param listener: Callable taking the event name and data, it must not block
+        :return: the listener, to unsubscribe it later
+        """
+
+        with self.__lock:
+            self.__listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        """
+        Remove a listener
+
+        :param listener: The listener returned by subscribe
+        """
+
+        with self.__lock:
+            if listener in self.__listeners:
+                self.__listeners.remove(listener)
+
+    def has_listeners(self):
+        return len(self.__listeners) > 0
+
+    def publish(self, event, data):
+        """
+        Pass an event to all listeners
+
+        :param event: The event name
+        :param data: JSON serializable event data
+        """
+
+        with self.__lock:
+            listeners = self.__listeners[:]
+        for listener in listeners:
+            listener(event, data)
+
+
+def format_event(event, data):
+    """
+    Format an event as a server-sent event message
+
+    :param event: The event name
+    :param data: JSON serializable event data
+    :return: message string
+    """
+
+    return 'event: {}\ndata: {}\n\n'.format(event, json.dumps(data))
@@ -1,8 +1,12 @@
+import binascii
 import hashlib as _hl
 import json
+from functools import lru_cache
 
+ADDRESS_LENGTH = 40
 
-# __all__ = ['hash_string_256', 'hash_block']
+
+# __all__ = ['hash_string_256', 'hash_block', 'merkle_root', 'to_address']
 
 
 def hash_string_256(string):
@@ -16,6 +20,29 @@ def hash_string_256(string):
     return _hl.sha256(string).hexdigest()
 
 
+def merkle_root(transactions):
+    """
+    Get the Merkle root of the ids of some transactions, pairing the last id with itself on odd levels
+
+    The number of transactions is hashed into the root, otherwise repeating the last transactions of an odd
+    level would give a different list with the same root, and a block could copy transactions without new work.
+
+    :param transactions: The transactions
+    :return: hex string, the SHA256 of nothing for no transactions
+    """
+
+    level = [bytes.fromhex(tx.tx_id()) for tx in transactions]
+    if len(level) < 1:
+        return _hl.sha256(b'').hexdigest()
+
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level.append(level[-1])
+        level = [_hl.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+
+    return _hl.sha256(len(transactions).to_bytes(8, 'big') + level[0]).hexdigest()
+
+
 def hash_block(block):
     """
     Hashes provided block
@@ -24,9 +51,49 @@ def hash_block(block):
     :return: Hashed string
     """
 
-    hashable_block = block.__dict__.copy()
-    hashable_block['transactions'] = [
-        tx.to_ordered_dict() for tx in hashable_block['transactions']
-    ]
+    if block.pruned_hash is not None:
+        return block.pruned_hash
+
+    hashable_block = {
+        'index': block.index,
+        'previous_hash': block.previous_hash,
+        'timestamp': block.timestamp,
+        'merkle_root': merkle_root(block.transactions),
+        'proof': block.proof
+    }
 
     return hash_string_256(json.dumps(hashable_block, sort_keys=True).encode())
+
+
+def hash_snapshot(snapshot):
+    """
+    Hashes provided state snapshot, ignoring its own hash field
+
+    :param snapshot: Snapshot dict
+    :return: Hashed string
+    """
+
+    hashable_snapshot = {key: value for key, value in snapshot.items() if key != 'hash'}
+
+    return hash_string_256(json.dumps(hashable_snapshot, sort_keys=True).encode())
+
+
+@lru_cache(maxsize=4096)
+def to_address(key):
+    """
+    Get the short address of an account from its hex encoded public key
+
+    Addresses and the MINING sender are returned unchanged, so old transactions naming
+    full public keys count for the same account as new ones naming addresses.
+
+    :param key: Hex encoded public key, address or 'MINING'
+    :return: address string, the key itself if it is not hex encoded
+    """
+
+    if key == 'MINING' or len(key) <= ADDRESS_LENGTH:
+        return key
+
+    try:
+        return _hl.sha256(binascii.unhexlify(key)).hexdigest()[:ADDRESS_LENGTH]
+    except ValueError:
+        return key
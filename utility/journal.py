@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+from time import time
+
+
+class Journal:
+    """
+    Append-only file of JSON entries, written in groups by a background thread
+
+    Appending only queues an entry. The writer thread commits all queued entries with a single write and
+    fsync once batch_size entries are queued or flush_interval seconds have passed since the first one,
+    so a crash loses at most the entries of that last interval. flush() waits until everything appended
+    so far is on disk.
+    """
+
+    def __init__(self, filename, flush_interval=0.05, batch_size=100):
+        """
+        Create a journal, the writer thread is started on the first append
+
+        :param filename: The journal file
+        :param flush_interval: Seconds an entry may wait before it is written
+        :param batch_size: Number of queued entries which are written without waiting for the interval
+        """
+
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.__pending = []
+        self.__appended = 0
+        self.__committed = 0
+        self.__generation = 0
+        self.__flush_requested = False
+        self.__closed = False
+        self.__condition = threading.Condition()
+        self.__file_lock = threading.Lock()
+        self.__file = None
+        self.__writer = None
+
+    def append(self, entries):
+        """
+        Queue entries to be written
+
+        :param entries: List of JSON serializable entries
+        """
+
+        with self.__condition:
+            if self.__closed:
+                raise ValueError('Journal is closed')
+            self.__pending.extend(entries)
+            self.__appended += len(entries)
+            if self.__writer is None:
+                self.__writer = threading.Thread(target=self.__run, daemon=True)
+                self.__writer.start()
+            self.__condition.notify_all()
+
+    def flush(self):
+        """
+        Wait until all appended entries are written
+        """
+
+        with self.__condition:
+            target = self.__appended
+            self.__flush_requested = True
+            self.__condition.notify_all()
+            while self.__committed < target and self.__writer is not None and self.__writer.is_alive():
+                self.__condition.wait()
+
+    def reset(self):
+        """
+        Drop all entries, written or queued, e.g. after their state was saved in full
+        """
+
+        with self.__condition:
+            self.__generation += 1
+            self.__pending = []
+            self.__committed = self.__appended
+            self.__condition.notify_all()
+        with self.__file_lock:
+            try:
+                if self.__file is not None:
+                    self.__file.truncate(0)
+                elif os.path.exists(self.filename):
+                    open(self.filename, mode='w').close()
+            except IOError:
+                print('Resetting journal failed')
+
+    def read(self):
+        """
+        Read the written entries, ignoring a last entry that was only partly written
+
+        :return: list of entries
+        """
+
+        try:
+            with open(self.filename, mode='r') as file:
+                lines = file.readlines()
+        except IOError:
+            return []
+
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+        return entries
+
+    def close(self):
+        """
+        Write the queued entries and stop the writer thread
+        """
+
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+            writer = self.__writer
+        if writer is not None:
+            writer.join()
+        with self.__file_lock:
+            if self.__file is not None:
+                self.__file.close()
+                self.__file = None
+
+    def __run(self):
+        while True:
+            with self.__condition:
+                while len(self.__pending) < 1 and not self.__closed:
+                    self.__condition.wait()
+                if len(self.__pending) < 1:
+                    return
+
+                # Give further entries the chance to join this write
+                deadline = time() + self.flush_interval
+                while len(self.__pending) < self.batch_size and not self.__closed and not self.__flush_requested:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        break
+                    self.__condition.wait(remaining)
+
+                batch, self.__pending = self.__pending, []
+                generation = self.__generation
+                sequence = self.__appended
+                self.__flush_requested = False
+
+            self.__write(batch, generation)
+
+            with self.__condition:
+                self.__committed = max(self.__committed, sequence)
+                self.__condition.notify_all()
+
+    def __write(self, batch, generation):
+        with self.__file_lock:
+            # A reset since the batch was taken already covers its entries
+            if generation != self.__generation:
+                return
+            try:
+                if self.__file is None:
+                    self.__file = open(self.filename, mode='a')
+                self.__file.write(''.join(json.dumps(entry) + '\n' for entry in batch))
+                self.__file.flush()
+                os.fsync(self.__file.fileno())
+            except IOError:
+                print('Saving journal failed')
@@ -0,0 +1,74 @@
+from argparse import ArgumentParser, ArgumentTypeError
+
+from blockchain import BLOCK_ADDED, BLOCK_KNOWN, BLOCK_ORPHAN, BLOCK_REORGANIZED, BLOCK_STALE, BLOCK_STORED
+from utility.profiler import MODES
+from utility.signing import DEFAULT_ALGORITHM, SCHEMES
+
+# Message and HTTP status answered on /broadcast-block for each receive_block status, anything else is invalid
+BLOCK_RESPONSES = {
+    BLOCK_ADDED: ('Block added', 201),
+    BLOCK_REORGANIZED: ('Block added', 201),
+    BLOCK_STORED: ('Block kept on a side branch, local chain holds as much or more work', 202),
+    BLOCK_STALE: ('Block is too old to switch to, local chain holds more work', 409),
+    BLOCK_ORPHAN: ('Parent block is unknown, block kept until it arrives', 202),
+    BLOCK_KNOWN: ('Block already known', 200)
+}
+INVALID_BLOCK_RESPONSE = ('Block seems invalid', 409)
+
+
+def block_response(status):
+    """
+    Get the answer to a block sent by a peer
+
+    :param status: The status returned by Blockchain.receive_block
+    :return: tuple of message and HTTP status code
+    """
+
+    return BLOCK_RESPONSES.get(status, INVALID_BLOCK_RESPONSE)
+
+
+def positive_int(value):
+    """
+    Parse a command line value that must be a whole number of at least 1
+
+    :param value: The value as given on the command line
+    :return: int
+    """
+
+    number = int(value)
+    if number < 1:
+        raise ArgumentTypeError('must be at least 1, got {}'.format(value))
+    return number
+
+
+def node_argument_parser():
+    """
+    Create the command line parser shared by the Flask and the asyncio node
+
+    :return: ArgumentParser
+    """
+
+    parser = ArgumentParser()
+    parser.add_argument('-p', '--port', type=int, default=5050)
+    parser.add_argument('--connect-timeout', type=float, default=2.0)
+    parser.add_argument('--read-timeout', type=float, default=10.0)
+    parser.add_argument('--failure-threshold', type=int, default=3)
+    parser.add_argument('--backoff-max', type=float, default=60.0)
+    parser.add_argument('--state-model', choices=['account', 'utxo'], default='account')
+    parser.add_argument('--checkpoint-interval', type=int, default=100)
+    parser.add_argument('--bootstrap', help='Peer node to fetch a snapshot from when starting with an empty chain')
+    parser.add_argument('--checkpoint-hash',
+                        help='Trusted hash the bootstrap snapshot must match, without it the peer snapshot is trusted')
+    parser.add_argument('--prune-depth', type=positive_int, help='Only keep transactions of this many recent blocks')
+    parser.add_argument('--signature-algorithm', choices=sorted(SCHEMES), default=DEFAULT_ALGORITHM,
+                        help='Signature algorithm of newly created wallets')
+    parser.add_argument('--journal-interval', type=float, default=0.05,
+                        help='Seconds accepted transactions may wait before they are written to disk')
+    parser.add_argument('--journal-batch', type=int, default=100,
+                        help='Number of accepted transactions written without waiting for the interval')
+    parser.add_argument('--profile', choices=MODES, help='Profile requests from the start, see POST /profile')
+    parser.add_argument('--profile-duration', type=float, help='Seconds to profile for')
+    parser.add_argument('--profile-requests', type=int, help='Number of requests to profile')
+    parser.add_argument('--profile-interval', type=float, default=0.005, help='Seconds between samples')
+    parser.add_argument('--profile-dir', default='profiles', help='Directory profiles are written to')
+    return parser
@@ -0,0 +1,230 @@
+import threading
+from time import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class PeerState:
+    """
+    Tracks the health of a single peer node and decides if it may be contacted (circuit breaker)
+    """
+
+    def __init__(self, node, failure_threshold, backoff_base, backoff_max):
+        """
+        Create the health state for a peer node
+
+        :param node: The node URL
+        :param failure_threshold: Consecutive failures before the circuit opens
+        :param backoff_base: Seconds to wait after the circuit first opens
+        :param backoff_max: Upper limit of the wait between health probes
+        """
+
+        self.node = node
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = 0
+        self.last_error = None
+        self.last_success = None
+
+    def allow_request(self):
+        """
+        Check if the peer may be contacted right now
+
+        :return: boolean
+        """
+
+        return self.state == CLOSED
+
+    def needs_probe(self):
+        """
+        Check if the circuit is open but the backoff has passed, so a health probe may be sent
+
+        :return: boolean
+        """
+
+        return self.state == OPEN and time() >= self.retry_at
+
+    def record_success(self):
+        """
+        Close the circuit after a successful call
+        """
+
+        self.state = CLOSED
+        self.failures = 0
+        self.retry_at = 0
+        self.last_error = None
+        self.last_success = time()
+
+    def record_failure(self, error):
+        """
+        Count a failed call and open the circuit with exponential backoff once the threshold is hit
+
+        :param error: The error that caused the failure
+        """
+
+        self.failures += 1
+        self.last_error = str(error)
+
+        if self.failures >= self.failure_threshold:
+            delay = min(self.backoff_base * 2 ** (self.failures - self.failure_threshold), self.backoff_max)
+            self.state = OPEN
+            self.retry_at = time() + delay
+
+    def to_dict(self):
+        """
+        Convert PeerState to dict
+
+        :return: dict
+        """
+
+        return {
+            'node': self.node,
+            'state': self.state,
+            'failures': self.failures,
+            'retry_in': max(round(self.retry_at - time(), 2), 0) if self.state == OPEN else 0,
+            'last_error': self.last_error,
+            'last_success': self.last_success
+        }
+
+
+class PeerClient:
+    """
+    Sends HTTP requests to peer nodes with timeouts, per-peer connection pools and circuit breaking
+    """
+
+    def __init__(self, connect_timeout=2.0, read_timeout=10.0, failure_threshold=3, backoff_base=1.0,
+                 backoff_max=60.0, pool_size=4, health_path='/health'):
+        """
+        Create a peer client
+
+        :param connect_timeout: Seconds to wait for a connection to a peer
+        :param read_timeout: Seconds to wait for a peer response
+        :param failure_threshold: Consecutive failures before a peer is skipped
+        :param backoff_base: Seconds to skip a peer after its circuit opens
+        :param backoff_max: Upper limit of the time a peer is skipped for
+        :param pool_size: Number of pooled connections kept per peer
+        :param health_path: Route used to probe a skipped peer
+        """
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.failure_threshold = failure_threshold
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_size = pool_size
+        self.health_path = health_path
+        self.__sessions = {}
+        self.__states = {}
+        self.__lock = threading.Lock()
+
+    def __get_session(self, node):
+        with self.__lock:
+            if node not in self.__sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.__sessions[node] = session
+            return self.__sessions[node]
+
+    def get_state(self, node):
+        """
+        Get the health state of a peer, creating it if missing
+
+        :param node: The node URL
+        :return: PeerState
+        """
+
+        with self.__lock:
+            if node not in self.__states:
+                self.__states[node] = PeerState(node, self.failure_threshold, self.backoff_base, self.backoff_max)
+            return self.__states[node]
+
+    def __probe(self, node, state):
+        state.state = HALF_OPEN
+        try:
+            response = self.__get_session(node).get(
+                'http://{}{}'.format(node, self.health_path), timeout=self.timeout
+            )
+            response.raise_for_status()
+        except requests.exceptions.RequestException as error:
+            state.record_failure(error)
+            return False
+
+        state.record_success()
+        return True
+
+    def is_available(self, node):
+        """
+        Check if a peer may be contacted, sending a health probe if its backoff has passed
+
+        :param node: The node URL
+        :return: boolean
+        """
+
+        state = self.get_state(node)
+        if state.needs_probe():
+            return self.__probe(node, state)
+
+        return state.allow_request()
+
+    def request(self, method, node, path, **kwargs):
+        """
+        Send a request to a peer
+
+        :param method: The HTTP method
+        :param node: The node URL
+        :param path: The route on the peer, e.g. '/chain'
+        :return: response|None if the peer is skipped or unreachable
+        """
+
+        if not self.is_available(node):
+            return None
+
+        state = self.get_state(node)
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.__get_session(node).request(method, 'http://{}{}'.format(node, path), **kwargs)
+        except requests.exceptions.RequestException as error:
+            print('Request to {} failed: {}'.format(node, error))
+            state.record_failure(error)
+            return None
+
+        state.record_success()
+        return response
+
+    def get(self, node, path, **kwargs):
+        return self.request('GET', node, path, **kwargs)
+
+    def post(self, node, path, **kwargs):
+        return self.request('POST', node, path, **kwargs)
+
+    def remove_peer(self, node):
+        """
+        Forget the state and connections of a peer
+
+        :param node: The node URL
+        """
+
+        with self.__lock:
+            self.__states.pop(node, None)
+            session = self.__sessions.pop(node, None)
+        if session is not None:
+            session.close()
+
+    def get_peer_states(self, nodes):
+        """
+        Get the health state of the supplied peers
+
+        :param nodes: The node URLs
+        :return: list of state dicts
+        """
+
+        return [self.get_state(node).to_dict() for node in nodes]
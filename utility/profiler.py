@@ -0,0 +1,301 @@
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from time import sleep, time
+
+DETERMINISTIC = 'deterministic'
+SAMPLING = 'sampling'
+MODES = (DETERMINISTIC, SAMPLING)
+
+# Window used when a session is started without a duration or request limit
+DEFAULT_DURATION = 60.0
+
+# Profiling can only be controlled from the node's own host
+LOCAL_ADDRESSES = ('127.0.0.1', '::1', 'localhost')
+
+# Routes which are never profiled, the admin route itself and long-lived event streams
+EXCLUDED_ROUTES = ('/profile', '/events')
+
+
+def frame_name(code):
+    """
+    Name a code object like a flamegraph frame
+
+    :param code: The code object of a frame
+    :return: string like 'blockchain.py:Blockchain.mine_block', without the class before Python 3.11
+    """
+
+    return '{}:{}'.format(os.path.basename(code.co_filename), getattr(code, 'co_qualname', code.co_name))
+
+
+class Profiler:
+    """
+    Profiles node requests for a time window or a number of requests
+
+    In deterministic mode every profiled request runs under its own cProfile profiler and the stats are
+    written per tag as pstats files. In sampling mode a background thread records the stacks of the
+    threads serving profiled requests every interval and writes them as collapsed stacks, one line per
+    stack with the tag as the root frame, which flamegraph.pl and speedscope read. Sampling only costs
+    the sampler thread, so it is the mode to use on a loaded node.
+    """
+
+    def __init__(self, node_id, directory='profiles'):
+        """
+        Create a profiler, profiling starts with start()
+
+        :param node_id: The node id, used in the file names
+        :param directory: Directory the profiles are written to
+        """
+
+        self.node_id = node_id
+        self.directory = directory
+        self.last_result = None
+        self.__lock = threading.Lock()
+        self.__session = None
+        self.__threads = {}
+
+    def start(self, mode=SAMPLING, duration=None, requests=None, interval=0.005):
+        """
+        Start a profiling session
+
+        :param mode: DETERMINISTIC or SAMPLING
+        :param duration: Seconds after which the session stops
+        :param requests: Number of requests after which the session stops
+        :param interval: Seconds between samples in sampling mode
+        :return: Boolean, False if a session is already running
+        """
+
+        if mode not in MODES:
+            raise ValueError('Unknown profiling mode {}'.format(mode))
+        if duration is None and requests is None:
+            duration = DEFAULT_DURATION
+        duration = None if duration is None else float(duration)
+        requests = None if requests is None else int(requests)
+        interval = float(interval)
+        if (duration is not None and duration <= 0) or (requests is not None and requests < 1) or interval <= 0:
+            raise ValueError('Profiling limits must be positive')
+
+        with self.__lock:
+            if self.__session is not None:
+                return False
+            session = {
+                'mode': mode,
+                'started': time(),
+                'duration': duration,
+                'requests': requests,
+                'interval': interval,
+                'count': 0,
+                'profiles': {},
+                'samples': Counter(),
+                'timer': None,
+                'sampler': None
+            }
+            self.__session = session
+
+        if duration is not None:
+            session['timer'] = threading.Timer(duration, self.__stop_session, (session,))
+            session['timer'].daemon = True
+            session['timer'].start()
+        if mode == SAMPLING:
+            session['sampler'] = threading.Thread(target=self.__sample, args=(session,), daemon=True)
+            session['sampler'].start()
+        return True
+
+    def stop(self):
+        """
+        Stop the running session and write its profiles
+
+        :return: result dict|None if no session was running
+        """
+
+        return self.__stop_session(self.__session)
+
+    def get_status(self):
+        """
+        Get the running session
+
+        :return: status dict|None if no session is running
+        """
+
+        session = self.__session
+        if session is None:
+            return None
+
+        return {
+            'mode': session['mode'],
+            'running_for': round(time() - session['started'], 3),
+            'duration': session['duration'],
+            'requests': session['requests'],
+            'profiled_requests': session['count']
+        }
+
+    def begin(self, tag):
+        """
+        Start profiling the work of the current thread for a request
+
+        :param tag: The route or operation the work belongs to, e.g. 'POST /mine'
+        :return: token for end()|None if nothing is profiled
+        """
+
+        session = self.__session
+        thread_id = threading.get_ident()
+        if session is None or thread_id in self.__threads:
+            return None
+
+        self.__threads[thread_id] = tag
+        profile = None
+        if session['mode'] == DETERMINISTIC:
+            profile = cProfile.Profile()
+            profile.enable()
+        return session, thread_id, tag, profile
+
+    def end(self, token):
+        """
+        Stop profiling the work started with begin()
+
+        :param token: The token returned by begin()
+        """
+
+        if token is None:
+            return
+
+        session, thread_id, tag, profile = token
+        if profile is not None:
+            profile.disable()
+        self.__threads.pop(thread_id, None)
+        with self.__lock:
+            if profile is not None:
+                session['profiles'].setdefault(tag, []).append(profile)
+
+    def count_request(self):
+        """
+        Count a finished request towards the request limit of the running session
+        """
+
+        session = self.__session
+        if session is None:
+            return
+
+        with self.__lock:
+            session['count'] += 1
+            done = session['requests'] is not None and session['count'] >= session['requests']
+        if done:
+            self.__stop_session(session)
+
+    @contextmanager
+    def profile(self, tag):
+        """
+        Profile the work done in the with block
+
+        :param tag: The route or operation the work belongs to
+        """
+
+        token = self.begin(tag)
+        try:
+            yield
+        finally:
+            self.end(token)
+
+    def run(self, tag, fn, *args):
+        """
+        Call a function while profiling it, e.g. on an executor thread
+
+        :param tag: The route or operation the call belongs to, None to call it unprofiled
+        :param fn: The function to call
+        :return: result of the function
+        """
+
+        if tag is None:
+            return fn(*args)
+        with self.profile(tag):
+            return fn(*args)
+
+    def __sample(self, session):
+        own_id = threading.get_ident()
+        while self.__session is session:
+            for thread_id, frame in sys._current_frames().items():
+                tag = self.__threads.get(thread_id)
+                if tag is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(tag)
+                session['samples'][';'.join(reversed(stack))] += 1
+            sleep(session['interval'])
+
+    def __stop_session(self, session):
+        with self.__lock:
+            if session is None or self.__session is not session:
+                return None
+            self.__session = None
+        if session['timer'] is not None:
+            session['timer'].cancel()
+        if session['sampler'] is not None and session['sampler'] is not threading.current_thread():
+            session['sampler'].join()
+
+        with self.__lock:
+            try:
+                result = self.__write_session(session)
+            except IOError:
+                print('Saving profile failed')
+                result = None
+            self.last_result = result
+        return result
+
+    def __write_session(self, session):
+        """
+        Write the profiles of a finished session and summarize them by tag and Blockchain method
+
+        :param session: The finished session
+        :return: result dict
+        """
+
+        os.makedirs(self.directory, exist_ok=True)
+        prefix = os.path.join(self.directory, '{}-{}'.format(self.node_id, int(session['started'] * 1000)))
+        files = []
+        tags = {}
+        methods = Counter()
+
+        if session['mode'] == DETERMINISTIC:
+            for tag, profiles in session['profiles'].items():
+                stats = pstats.Stats(profiles[0], stream=io.StringIO())
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                filename = '{}-{}.pstats'.format(prefix, re.sub(r'[^A-Za-z0-9]+', '_', tag).strip('_'))
+                stats.dump_stats(filename)
+                files.append(filename)
+                tags[tag] = round(stats.total_tt, 6)
+                for (path, line, name), stat in stats.stats.items():
+                    if os.path.basename(path) == 'blockchain.py' and not name.startswith('<'):
+                        methods['Blockchain.{}'.format(name)] += stat[3]
+        else:
+            filename = '{}.collapsed'.format(prefix)
+            with open(filename, mode='w') as file:
+                for stack, count in session['samples'].items():
+                    file.write('{} {}\n'.format(stack, count))
+            files.append(filename)
+            for stack, count in session['samples'].items():
+                frames = stack.split(';')
+                tags[frames[0]] = tags.get(frames[0], 0) + count
+                # Match on the file like the deterministic stats, code objects only name their class since 3.11
+                for name in {'Blockchain.{}'.format(frame.split(':', 1)[1].rsplit('.', 1)[-1]) for frame in frames[1:]
+                             if frame.startswith('blockchain.py:') and '<' not in frame}:
+                    methods[name] += count
+
+        return {
+            'mode': session['mode'],
+            'duration': round(time() - session['started'], 3),
+            'profiled_requests': session['count'],
+            'unit': 'seconds' if session['mode'] == DETERMINISTIC else 'samples',
+            'files': files,
+            'tags': tags,
+            'methods': {name: round(value, 6) for name, value in methods.most_common()}
+        }
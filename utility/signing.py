@@ -0,0 +1,103 @@
+import binascii
+from functools import lru_cache
+
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import ECC, RSA
+from Crypto.Signature import DSS, PKCS1_v1_5
+import Crypto.Random
+
+# __all__ = ['SCHEMES', 'DEFAULT_ALGORITHM', 'get_scheme']
+
+
+@lru_cache(maxsize=1024)
+def _import_rsa_key(key):
+    return RSA.importKey(binascii.unhexlify(key))
+
+
+@lru_cache(maxsize=1024)
+def _import_ecc_key(key):
+    return ECC.import_key(binascii.unhexlify(key))
+
+
+class RsaScheme:
+    """
+    1024 bit RSA with PKCS#1 v1.5 signatures, the original wallet scheme
+    """
+
+    name = 'rsa'
+
+    def generate_keys(self):
+        """
+        Generates public and private keys
+
+        :return: tuple containing hex encoded DER private key and public key
+        """
+
+        private_key = RSA.generate(1024, Crypto.Random.new().read)
+        public_key = private_key.public_key()
+
+        return (
+            binascii.hexlify(private_key.exportKey(format='DER')).decode('ascii'),
+            binascii.hexlify(public_key.exportKey(format='DER')).decode('ascii')
+        )
+
+    def sign(self, private_key, message):
+        signer = PKCS1_v1_5.new(_import_rsa_key(private_key))
+        return binascii.hexlify(signer.sign(SHA256.new(message))).decode('ascii')
+
+    def verify(self, public_key, message, signature):
+        verifier = PKCS1_v1_5.new(_import_rsa_key(public_key))
+        return verifier.verify(SHA256.new(message), binascii.unhexlify(signature))
+
+
+class EcdsaScheme:
+    """
+    ECDSA on the NIST P-256 curve with deterministic (RFC 6979) signatures
+
+    Public keys (91 instead of 162 bytes) and signatures (64 instead of 128 bytes) are about half the size
+    of the RSA ones. Signing is slightly faster, but verifying is three to four times slower than RSA.
+    """
+
+    name = 'ecdsa'
+
+    def generate_keys(self):
+        """
+        Generates public and private keys
+
+        :return: tuple containing hex encoded DER private key and public key
+        """
+
+        private_key = ECC.generate(curve='P-256')
+        public_key = private_key.public_key()
+
+        return (
+            binascii.hexlify(private_key.export_key(format='DER')).decode('ascii'),
+            binascii.hexlify(public_key.export_key(format='DER')).decode('ascii')
+        )
+
+    def sign(self, private_key, message):
+        signer = DSS.new(_import_ecc_key(private_key), 'deterministic-rfc6979')
+        return binascii.hexlify(signer.sign(SHA256.new(message))).decode('ascii')
+
+    def verify(self, public_key, message, signature):
+        verifier = DSS.new(_import_ecc_key(public_key), 'fips-186-3')
+        try:
+            verifier.verify(SHA256.new(message), binascii.unhexlify(signature))
+        except ValueError:
+            return False
+        return True
+
+
+SCHEMES = {scheme.name: scheme for scheme in (RsaScheme(), EcdsaScheme())}
+DEFAULT_ALGORITHM = RsaScheme.name
+
+
+def get_scheme(algorithm=None):
+    """
+    Get the signature scheme for an algorithm tag
+
+    :param algorithm: The algorithm name, None for the default
+    :return: scheme|None if the algorithm is unknown
+    """
+
+    return SCHEMES.get(DEFAULT_ALGORITHM if algorithm is None else algorithm)
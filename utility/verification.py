@@ -1,6 +1,11 @@
-from utility.hash_util import hash_block, hash_string_256
+from concurrent.futures import ThreadPoolExecutor
+
+from utility.hash_util import hash_block, hash_string_256, merkle_root
 from wallet import Wallet
 
+# Number of leading zeros a block hash needs
+DIFFICULTY = 2
+
 
 class Verification:
     """
@@ -8,26 +13,39 @@ class Verification:
     """
 
     @staticmethod
-    def valid_proof(transactions, last_hash, proof):
+    def valid_proof(transactions, last_hash, proof, root=None):
         """
         Validates proof algorithm to solve hash
 
         :param transactions: Open transactions
         :param last_hash: Hash of last block in blockchain
         :param proof: Current guess
+        :param root: Merkle root of the transactions, if already computed
         :return: result of proof validation
         """
 
-        guess = (str([tx.to_ordered_dict() for tx in transactions]) + str(last_hash) + str(proof)).encode()
+        if root is None:
+            root = merkle_root(transactions)
+        guess = (root + str(last_hash) + str(proof)).encode()
         guess_hash = hash_string_256(guess)
-        print(guess_hash)
 
-        return guess_hash[0:2] == '00'
+        return guess_hash[0:DIFFICULTY] == '0' * DIFFICULTY
+
+    @staticmethod
+    def block_work(block):
+        """
+        Get the expected number of hashes needed to find the proof of a block
+
+        :param block: The block
+        :return: int
+        """
+
+        return 16 ** DIFFICULTY
 
     @classmethod
     def verify_chain(cls, blockchain):
         """
-        Verify the current blockchain
+        Verify the current blockchain, skipping the proof of blocks whose transactions were pruned
 
         :return: result of chain validation
         """
@@ -37,12 +55,48 @@ class Verification:
                 continue
             if block.previous_hash != hash_block(blockchain[index - 1]):
                 return False
+            if block.pruned_hash is not None:
+                continue
             if not cls.valid_proof(block.transactions[:-1], block.previous_hash, block.proof):
                 print('Proof of work is invalid')
                 return False
+            if not cls.verify_block_signatures(block):
+                print('Block holds an invalid signature')
+                return False
 
         return True
 
+    @staticmethod
+    def valid_amount(amount):
+        """
+        Check that an amount sent by a client or peer is a number
+
+        :param amount: The amount
+        :return: Boolean
+        """
+
+        return isinstance(amount, (int, float)) and not isinstance(amount, bool)
+
+    @classmethod
+    def verify_transaction_format(cls, transaction):
+        """
+        Check that a transaction dict sent by a client or peer has the fields and field types of a transaction
+
+        :param transaction: The transaction dict
+        :return: Boolean
+        """
+
+        if not isinstance(transaction, dict) or not cls.valid_amount(transaction.get('amount')):
+            return False
+        if not all(isinstance(transaction.get(key), str) for key in ('sender', 'recipient', 'signature')):
+            return False
+        if not all(transaction.get(key) is None or isinstance(transaction[key], str)
+                   for key in ('public_key', 'algorithm')):
+            return False
+
+        inputs = transaction.get('inputs')
+        return inputs is None or (isinstance(inputs, list) and all(isinstance(outpoint, str) for outpoint in inputs))
+
     @staticmethod
     def verify_transaction(transaction, get_balance, check_funds=True):
         """
@@ -60,6 +114,19 @@ class Verification:
         else:
             return Wallet.verify_transaction(transaction)
 
+    @staticmethod
+    def verify_utxo_transaction(transaction, utxo_set, spent_inputs):
+        """
+        Verify that a transaction spends unspent outputs of its sender and is signed by them
+
+        :param transaction: Transaction to verify
+        :param utxo_set: The UtxoSet of the chain
+        :param spent_inputs: Outpoints already spent by open transactions
+        :return: result of transaction verification
+        """
+
+        return utxo_set.validate_transaction(transaction, spent_inputs) and Wallet.verify_transaction(transaction)
+
     @classmethod
     def verify_transactions(cls, open_transactions, get_balance):
         """
@@ -71,3 +138,43 @@ class Verification:
         """
 
         return all([cls.verify_transaction(tx, get_balance, False) for tx in open_transactions])
+
+    @staticmethod
+    def verify_signature(transaction):
+        """
+        Verify the signature of a transaction, treating malformed keys or signatures as invalid
+
+        :param transaction: Transaction to verify
+        :return: result of signature verification
+        """
+
+        try:
+            return Wallet.verify_transaction(transaction)
+        except (ValueError, TypeError, IndexError):
+            return False
+
+    @classmethod
+    def verify_block_signatures(cls, block):
+        """
+        Verify the signatures of all transactions of a block except the mining reward
+
+        :param block: Block to verify
+        :return: True if all signatures are valid, else False
+        """
+
+        return all(cls.verify_signatures([tx for tx in block.transactions if tx.sender != 'MINING']))
+
+    @classmethod
+    def verify_signatures(cls, transactions):
+        """
+        Verify the signatures of many transactions in parallel
+
+        :param transactions: Transactions to verify
+        :return: list of verification results in the order of the transactions
+        """
+
+        if len(transactions) < 2:
+            return [cls.verify_signature(tx) for tx in transactions]
+
+        with ThreadPoolExecutor() as executor:
+            return list(executor.map(cls.verify_signature, transactions))
@@ -0,0 +1,205 @@
+import json
+
+from utility.hash_util import to_address
+
+
+class UtxoSet:
+    def __init__(self, outputs=None):
+        """
+        The set of unspent transaction outputs, keyed by outpoint '<block index>:<tx index>:<output index>'
+
+        :param outputs: Dict of outpoint to output dict with owner address and amount
+        """
+
+        self.__outputs = {}
+        self.__owned = {}
+        for outpoint, output in (outputs or {}).items():
+            self.__add(outpoint, output)
+
+    def __add(self, outpoint, output):
+        self.__outputs[outpoint] = output
+        self.__owned.setdefault(output['owner'], set()).add(outpoint)
+
+    def __remove(self, outpoint):
+        output = self.__outputs.pop(outpoint)
+        owned = self.__owned[output['owner']]
+        owned.discard(outpoint)
+        if len(owned) < 1:
+            del self.__owned[output['owner']]
+        return output
+
+    @staticmethod
+    def transaction_outputs(block_index, tx_index, transaction, input_total):
+        """
+        Get the outputs created by a transaction: the amount for the recipient and any change for the sender
+
+        :param block_index: Index of the block holding the transaction
+        :param tx_index: Position of the transaction in the block
+        :param transaction: The transaction
+        :param input_total: Sum of the outputs spent by the transaction
+        :return: list of (outpoint, output) tuples
+        """
+
+        outputs = [
+            ('{}:{}:0'.format(block_index, tx_index),
+             {'owner': to_address(transaction.recipient), 'amount': transaction.amount})
+        ]
+        change = input_total - transaction.amount
+        if change > 0:
+            outputs.append(
+                ('{}:{}:1'.format(block_index, tx_index), {'owner': to_address(transaction.sender), 'amount': change})
+            )
+        return outputs
+
+    def get(self, outpoint):
+        return self.__outputs.get(outpoint)
+
+    def balance(self, owner):
+        """
+        Sum of the unspent outputs of an owner
+
+        :param owner: The owner's address
+        :return: balance amount
+        """
+
+        return sum(self.__outputs[outpoint]['amount'] for outpoint in self.__owned.get(owner, ()))
+
+    def select(self, owner, amount, exclude=()):
+        """
+        Pick unspent outputs of an owner that cover an amount
+
+        :param owner: The owner's address
+        :param amount: The amount to cover
+        :param exclude: Outpoints which must not be picked, e.g. ones spent by open transactions
+        :return: list of outpoints|None if the funds are insufficient
+        """
+
+        selected = []
+        total = 0
+        for outpoint in sorted(self.__owned.get(owner, ())):
+            if total >= amount:
+                break
+            if outpoint in exclude:
+                continue
+            selected.append(outpoint)
+            total += self.__outputs[outpoint]['amount']
+
+        if total < amount or len(selected) < 1:
+            return None
+        return selected
+
+    def validate_transaction(self, transaction, spent=()):
+        """
+        Check that a transaction only spends existing outputs of its sender that cover the amount
+
+        :param transaction: Transaction to check
+        :param spent: Outpoints already spent elsewhere, e.g. by open transactions or earlier in the block
+        :return: boolean
+        """
+
+        if not transaction.inputs or len(set(transaction.inputs)) != len(transaction.inputs):
+            return False
+
+        sender = to_address(transaction.sender)
+        total = 0
+        for outpoint in transaction.inputs:
+            output = self.__outputs.get(outpoint)
+            if output is None or outpoint in spent or output['owner'] != sender:
+                return False
+            total += output['amount']
+
+        return total >= transaction.amount
+
+    def apply_block(self, block, mining_sender='MINING'):
+        """
+        Spend the inputs and add the outputs of all transactions of a block
+
+        Either the whole block is applied or nothing is changed.
+
+        :param block: The block to apply
+        :param mining_sender: Sender of the reward transaction, which has no inputs and comes last
+        :return: undo data (list of spent outpoints and outputs)|None if the block spends invalid outputs
+        """
+
+        spent = set()
+        for tx_index, tx in enumerate(block.transactions):
+            if tx.sender == mining_sender:
+                if tx_index != len(block.transactions) - 1 or tx.inputs:
+                    return None
+                continue
+            if not self.validate_transaction(tx, spent):
+                return None
+            spent.update(tx.inputs)
+
+        undo = []
+        for tx_index, tx in enumerate(block.transactions):
+            input_total = tx.amount if tx.sender == mining_sender else 0
+            for outpoint in tx.inputs:
+                output = self.__remove(outpoint)
+                undo.append([outpoint, output])
+                input_total += output['amount']
+            for outpoint, output in self.transaction_outputs(block.index, tx_index, tx, input_total):
+                self.__add(outpoint, output)
+
+        return undo
+
+    def undo_block(self, block, undo):
+        """
+        Revert a block applied with apply_block
+
+        :param block: The block to revert
+        :param undo: The undo data returned when the block was applied
+        """
+
+        for tx_index in range(len(block.transactions)):
+            for output_index in (0, 1):
+                outpoint = '{}:{}:{}'.format(block.index, tx_index, output_index)
+                if outpoint in self.__outputs:
+                    self.__remove(outpoint)
+        for outpoint, output in undo:
+            self.__add(outpoint, output)
+
+    def to_dict(self):
+        """
+        Convert UtxoSet to dict
+
+        :return: dict of outpoint to output
+        """
+
+        return dict(self.__outputs)
+
+    def save(self, filename, tip_hash, undo):
+        """
+        Save a snapshot of the set together with the chain tip it belongs to
+
+        :param filename: The file to write
+        :param tip_hash: Hash of the last block applied
+        :param undo: Dict of block index to undo data
+        """
+
+        try:
+            with open(filename, mode='w') as file:
+                file.write(json.dumps({
+                    'tip_hash': tip_hash,
+                    'outputs': self.__outputs,
+                    'undo': undo
+                }))
+        except IOError:
+            print('Saving UTXO set failed')
+
+    @staticmethod
+    def load(filename):
+        """
+        Load a snapshot written by save
+
+        :param filename: The file to read
+        :return: tuple of UtxoSet, tip hash and undo data|None if no snapshot exists
+        """
+
+        try:
+            with open(filename, mode='r') as file:
+                snapshot = json.loads(file.read())
+            undo = {int(index): data for index, data in snapshot['undo'].items()}
+            return UtxoSet(snapshot['outputs']), snapshot['tip_hash'], undo
+        except (IOError, ValueError, KeyError):
+            return None
@@ -1,19 +1,35 @@
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
-from Crypto.Hash import SHA256
-import Crypto.Random
-import binascii
+from transaction import Transaction
+from utility.hash_util import to_address
+from utility.signing import DEFAULT_ALGORITHM, get_scheme
 
 
 class Wallet:
-    def __init__(self, node_id):
+    def __init__(self, node_id, algorithm=DEFAULT_ALGORITHM):
         """
         Creates and manages public and private keys
+
+        :param node_id: the id of the node owning the wallet
+        :param algorithm: The signature algorithm used for new keys, 'rsa' or 'ecdsa'
         """
 
+        if get_scheme(algorithm) is None:
+            raise ValueError('Unknown signature algorithm {}'.format(algorithm))
+
         self.private_key = None
         self.public_key = None
         self.node_id = node_id
+        self.algorithm = algorithm
+
+    @property
+    def address(self):
+        """
+        The short address identifying this wallet in transactions
+        """
+
+        if self.public_key is None:
+            return None
+
+        return to_address(self.public_key)
 
     def create_keys(self):
         """
@@ -35,6 +51,8 @@ class Wallet:
                     f.write(self.public_key)
                     f.write('\n')
                     f.write(self.private_key)
+                    f.write('\n')
+                    f.write(self.algorithm)
                 return True
             except (IOError, IndexError):
                 print('Saving wallet failed...')
@@ -51,58 +69,70 @@ class Wallet:
             with open('wallet-{}.txt'.format(self.node_id), mode='r') as f:
                 keys = f.readlines()
                 public_key = keys[0][:-1]
-                private_key = keys[1]
+                private_key = keys[1].rstrip('\n')
+                # Wallets saved before signature algorithms were selectable hold RSA keys
+                algorithm = keys[2].strip() if len(keys) > 2 else DEFAULT_ALGORITHM
+                if get_scheme(algorithm) is None:
+                    raise ValueError('Unknown signature algorithm {}'.format(algorithm))
                 self.public_key = public_key
                 self.private_key = private_key
+                self.algorithm = algorithm
             return True
-        except (IOError, IndexError):
+        except (IOError, IndexError, ValueError):
             print('Loading wallet failed...')
             return False
 
     def generate_keys(self):
         """
-        Generates public and private keys
+        Generates public and private keys for the wallet's signature algorithm
 
         :return: tuple containing private key and public key
         """
 
-        private_key = RSA.generate(1024, Crypto.Random.new().read)
-        public_key = private_key.public_key()
+        return get_scheme(self.algorithm).generate_keys()
 
-        return (
-            binascii.hexlify(private_key.exportKey(format='DER')).decode('ascii'),
-            binascii.hexlify(public_key.exportKey(format='DER')).decode('ascii')
-        )
-
-    def sign_transaction(self, sender, recipient, amount):
+    def sign_transaction(self, sender, recipient, amount, inputs=None):
         """
         Create signature for a transaction
 
+        The signed transaction must carry the wallet's algorithm, and its public key if the sender is
+        the wallet's address.
+
         :param sender: The transaction sender
         :param recipient: The transaction recipient
         :param amount: The transaction amount
+        :param inputs: The outpoints spent by the transaction, if any
         :return: signature string
         """
 
-        signer = PKCS1_v1_5.new(RSA.importKey(binascii.unhexlify(self.private_key)))
-        h = SHA256.new((str(sender) + str(recipient) + str(amount)).encode('utf8'))
-        signature = signer.sign(h)
+        public_key = self.public_key if sender == self.address else None
+        transaction = Transaction(sender, recipient, None, amount, inputs, public_key, self.algorithm)
 
-        return binascii.hexlify(signature).decode('ascii')
+        return get_scheme(self.algorithm).sign(self.private_key, transaction.encode())
 
     @staticmethod
     def verify_transaction(transaction):
         """
         Verify the signature of a transaction
 
+        A sender given as an address must come with the public_key it was derived from.
+        The transaction's algorithm tag selects the signature scheme, untagged ones are RSA.
+
         :param transaction:
         :return: result of verification
         """
 
-        public_key = RSA.importKey(binascii.unhexlify(transaction.sender))
-        verifier = PKCS1_v1_5.new(public_key)
-        h = SHA256.new(
-            (str(transaction.sender) + str(transaction.recipient) + str(transaction.amount)).encode('utf8')
-        )
+        scheme = get_scheme(transaction.algorithm)
+        if scheme is None:
+            return False
+
+        if transaction.public_key is not None:
+            if to_address(transaction.public_key) != transaction.sender:
+                return False
+            key = transaction.public_key
+        elif to_address(transaction.sender) == transaction.sender:
+            return False
+        else:
+            key = transaction.sender
 
-        return verifier.verify(h, binascii.unhexlify(transaction.signature))
+        return scheme.verify(key, transaction.encode(), transaction.signature)